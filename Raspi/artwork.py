@@ -0,0 +1,117 @@
+# artwork.py
+
+"""
+Makes local album art reachable for the UI server.
+
+Desktop players such as VLC, Rhythmbox or mpv report their art as a
+file:// URL, which nothing outside this machine can fetch. ArtworkCache reads
+such a file once, downscales it to the size the display needs, stores it under
+its content hash and hands back an http:// URL served by the bridge itself.
+Identical art (e.g. every track of an album) is only ever encoded once.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+from urllib.parse import unquote, urlsplit
+
+from http_server import Response
+
+try:
+    from PIL import Image
+except ImportError: # Pillow is optional; without it local art URLs are forwarded unchanged
+    Image = None
+
+ARTWORK_ROUTE = "/artwork/"
+ARTWORK_JPEG_QUALITY = 85
+_CACHE_FILE_PATTERN = re.compile(r'^[0-9a-f]{64}\.jpg$')
+
+
+class ArtworkCache:
+    """Content-addressed cache of downscaled local art, served under ARTWORK_ROUTE."""
+
+    def __init__(self, cache_dir, size, base_url, max_files=200):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.base_url = base_url.rstrip('/')
+        self.max_files = max_files
+        # path -> ((mtime, size), cache file name), so an unchanged file is never re-hashed
+        self._resolved = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        if Image is None:
+            logging.warning("Pillow is not installed: local (file://) artwork will not be forwarded.")
+
+    async def resolve(self, art_url):
+        """Returns an URL the UI server can fetch; non-file URLs are returned unchanged."""
+        if not art_url or not art_url.startswith('file://') or Image is None:
+            return art_url
+        path = unquote(urlsplit(art_url).path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logging.warning(f"Local artwork '{path}' is not readable: {e}")
+            return ""
+        file_id = (stat.st_mtime_ns, stat.st_size)
+        cached = self._resolved.get(path)
+        if cached and cached[0] == file_id and os.path.exists(os.path.join(self.cache_dir, cached[1])):
+            return self._url(cached[1])
+
+        loop = asyncio.get_running_loop()
+        try:
+            name = await loop.run_in_executor(None, self._store, path)
+        except Exception as e:
+            logging.error(f"Failed to process local artwork '{path}': {e}")
+            return ""
+        self._resolved[path] = (file_id, name)
+        return self._url(name)
+
+    def _url(self, name):
+        return f"{self.base_url}{ARTWORK_ROUTE}{name}"
+
+    def _store(self, path):
+        """Runs in a worker thread: hashes the file and writes the downscaled JPEG if it is new."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        name = hashlib.sha256(data).hexdigest() + '.jpg'
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target):
+            return name
+
+        im = Image.open(io.BytesIO(data))
+        im = im.convert('RGB')
+        im.thumbnail((self.size, self.size))
+        tmp = target + '.tmp'
+        im.save(tmp, 'JPEG', quality=ARTWORK_JPEG_QUALITY)
+        os.replace(tmp, target)
+        logging.info(f"Cached local artwork '{path}' as {name}")
+        self._evict()
+        return name
+
+    def _evict(self):
+        entries = [e for e in os.scandir(self.cache_dir) if _CACHE_FILE_PATTERN.match(e.name)]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            os.remove(entry.path)
+
+    async def handle_request(self, request):
+        """HttpServer route for ARTWORK_ROUTE."""
+        name = request.path[len(ARTWORK_ROUTE):]
+        if not _CACHE_FILE_PATTERN.match(name):
+            return Response(404, b"Not found\n")
+        loop = asyncio.get_running_loop()
+        try:
+            body = await loop.run_in_executor(None, _read_file, os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            return Response(404, b"Not found\n")
+        # Content-addressed, so the file behind a name never changes
+        return Response(200, body, "image/jpeg", {"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
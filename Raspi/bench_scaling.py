@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# bench_scaling.py
+
+"""
+Measures how the bridge scales with the number of MPRIS players on the bus,
+e.g. one per open browser tab.
+
+For every fleet size, N mock players (mocks.py) are started in a separate
+process on a private dbus-daemon and randomly change tracks, seek and change
+volume at the given per-player rates. Player 0 is playing, so it is the
+active one; it additionally changes its track every --probe-interval seconds
+with the send time in the title, which gives the status latency: the time
+from the player's signal until the bridge publishes the new status. The
+bridge itself runs unmodified in this process against an MQTT stand-in, so
+CPU time and RSS are those of the bridge alone.
+
+    python3 bench_scaling.py [--players 1,5,10,20,50] [--duration 10]
+                             [--track-rate 0.1] [--seek-rate 0.05] [--volume-rate 0.2]
+
+RSS is the resident size at the end of each run; Python rarely returns
+memory to the OS, so it only ever grows across the runs of one invocation.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import statistics
+import time
+
+from dbus_next.aio import MessageBus
+
+import main
+from mocks import MockPlayer, MqttStandIn, PrivateBus
+
+WARMUP_SECONDS = 1.0
+PROBE_TITLE_PREFIX = "probe "
+
+
+def track_metadata(index, track, title=None):
+    return {
+        "mpris:trackid": f"/org/mpris/MediaPlayer2/bench/{index}/track/{track}",
+        "mpris:length": 180_000_000,
+        "xesam:title": title or f"Track {track}",
+        "xesam:artist": [f"Bench player {index}"],
+    }
+
+
+# --- Player fleet (runs in a child process) ---
+async def churn(player, index, rates, rng):
+    """Randomly changes tracks, seeks and changes the volume at the given per-second rates."""
+    kinds = [kind for kind, rate in rates.items() if rate > 0]
+    if not kinds:
+        return
+    total = sum(rates[kind] for kind in kinds)
+    track = 0
+    while True:
+        await asyncio.sleep(rng.expovariate(total))
+        kind = rng.choices(kinds, weights=[rates[k] for k in kinds])[0]
+        if kind == "track":
+            track += 1
+            player.apply({"Metadata": track_metadata(index, track)})
+        elif kind == "seek":
+            player.seeked(rng.randrange(0, 180_000_000))
+        else:
+            player.apply({"Volume": rng.random()})
+
+
+async def probe(player, interval):
+    """Changes the active player's track with the send time in the title."""
+    sequence = 0
+    while True:
+        await asyncio.sleep(interval)
+        sequence += 1
+        title = f"{PROBE_TITLE_PREFIX}{time.monotonic_ns()}"
+        player.apply({"Metadata": track_metadata(0, 1_000_000 + sequence, title)})
+
+
+async def run_fleet_async(address, count, rates, probe_interval, seed, ready):
+    players = []
+    for index in range(count):
+        player = MockPlayer(f"bench{index}", {
+            "PlaybackStatus": "Playing" if index == 0 else "Paused",
+            "Metadata": track_metadata(index, 0),
+            "Volume": 0.5,
+        })
+        players.append(await player.connect(address))
+    ready.set()
+    await asyncio.gather(
+        probe(players[0], probe_interval),
+        *(churn(player, index, rates, random.Random(seed + index)) for index, player in enumerate(players)),
+    )
+
+
+def run_fleet(address, count, rates, probe_interval, seed, ready):
+    asyncio.run(run_fleet_async(address, count, rates, probe_interval, seed, ready))
+
+
+# --- Measurement ---
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * resource.getpagesize() / (1024 * 1024)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def measure(count, args):
+    rates = {"track": args.track_rate, "seek": args.seek_rate, "volume": args.volume_rate}
+    context = multiprocessing.get_context('spawn')
+    async with PrivateBus() as private_bus:
+        ready = context.Event()
+        fleet = context.Process(target=run_fleet, daemon=True,
+                                args=(private_bus.address, count, rates, args.probe_interval, args.seed, ready))
+        fleet.start()
+        try:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, ready.wait, 30):
+                raise RuntimeError(f"Player fleet of {count} did not start")
+
+            mqtt = MqttStandIn()
+            latencies = []
+            seen_probes = set()
+            measuring = False
+
+            def on_publish(topic, payload):
+                if not measuring or topic != main.MQTT_TOPIC:
+                    return
+                title = json.loads(payload).get("title", "")
+                # A seek republishes the same title; only the first publish of a probe counts
+                if title.startswith(PROBE_TITLE_PREFIX) and title not in seen_probes:
+                    seen_probes.add(title)
+                    latencies.append((time.monotonic_ns() - int(title[len(PROBE_TITLE_PREFIX):])) / 1e6)
+
+            mqtt.on_publish = on_publish
+            bus = await MessageBus(bus_address=private_bus.address).connect()
+            bridge = main.MprisBridge(bus, main.PlayerProxyCache(bus), mqtt)
+            bridge_task = asyncio.ensure_future(bridge.run())
+            await asyncio.sleep(WARMUP_SECONDS)
+
+            calls_before = sum(main.DBUS_CALL_SECONDS.counts().values())
+            refreshes_before = sum(main.REFRESH_SECONDS.counts().values())
+            publishes_before = len(mqtt.published)
+            cpu_before = time.process_time()
+            measuring = True
+            await asyncio.sleep(args.duration)
+            measuring = False
+            cpu = time.process_time() - cpu_before
+
+            result = {
+                "players": count,
+                "cpu_percent": cpu / args.duration * 100,
+                "rss_mb": rss_mb(),
+                "publishes": len(mqtt.published) - publishes_before,
+                "refreshes": sum(main.REFRESH_SECONDS.counts().values()) - refreshes_before,
+                "dbus_calls": sum(main.DBUS_CALL_SECONDS.counts().values()) - calls_before,
+                "latency_p50_ms": percentile(latencies, 0.5),
+                "latency_p95_ms": percentile(latencies, 0.95),
+                "latency_mean_ms": statistics.fmean(latencies) if latencies else float('nan'),
+            }
+            bridge_task.cancel()
+            try:
+                await bridge_task
+            except asyncio.CancelledError:
+                pass
+            bus.disconnect()
+            return result
+        finally:
+            fleet.terminate()
+            fleet.join()
+
+
+def print_row(result):
+    print(f"{result['players']:>7} {result['cpu_percent']:>6.1f} {result['rss_mb']:>7.1f} "
+          f"{result['publishes']:>9} {result['refreshes']:>9} {result['dbus_calls']:>10} "
+          f"{result['latency_p50_ms']:>9.1f} {result['latency_p95_ms']:>9.1f}")
+
+
+async def run(args):
+    print(f"{args.duration:.0f}s per run; per player: {args.track_rate} track changes/s, "
+          f"{args.seek_rate} seeks/s, {args.volume_rate} volume changes/s")
+    print(f"{'players':>7} {'cpu %':>6} {'rss MB':>7} {'publishes':>9} {'refreshes':>9} {'dbus calls':>10} "
+          f"{'p50 ms':>9} {'p95 ms':>9}")
+    results = []
+    for count in args.players:
+        result = await measure(count, args)
+        print_row(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the bridge against growing fleets of mock players.")
+    parser.add_argument("--players", type=lambda s: [int(n) for n in s.split(',')], default=[1, 2, 5, 10, 20, 50],
+                        help="comma-separated fleet sizes (default: 1,2,5,10,20,50)")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per fleet size")
+    parser.add_argument("--track-rate", type=float, default=0.1, help="track changes per second and player")
+    parser.add_argument("--seek-rate", type=float, default=0.05, help="seeks per second and player")
+    parser.add_argument("--volume-rate", type=float, default=0.2, help="volume changes per second and player")
+    parser.add_argument("--probe-interval", type=float, default=0.5,
+                        help="seconds between latency probes on the active player")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.getLogger().setLevel(logging.WARNING) # Status updates would drown the table
+    asyncio.run(run(parse_args()))
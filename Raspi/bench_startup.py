@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# bench_startup.py
+
+"""
+Measures how long the bridge takes from process start to its first published
+status, broken down into startup phases.
+
+Every run starts main.py's main_loop in a fresh Python process, exactly as
+systemd would, against a private dbus-daemon with --players mock players
+(mocks.py). By default MQTT is replaced by an in-process stand-in, so the
+numbers exclude the network. With --broker the real transport connects to
+that broker instead, which adds the (overlapping) broker handshake.
+
+    python3 bench_startup.py [--runs 5] [--players 3] [--broker host:port]
+
+All times are milliseconds since the process was spawned, as the median over
+the runs. The import breakdown lists the slowest modules main.py imports
+(from python -X importtime). The page cache stays warm between runs, so on a
+freshly booted Pi the first real start is slower than any of them.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+PHASES = [
+    ("interpreter", "Python started, before any import"),
+    ("imported", "main.py and its dependencies imported"),
+    ("dbus_connected", "session bus connection established"),
+    ("players_listed", "players listed (signal matches and subscriptions run alongside)"),
+    ("status_published", "first status published (or queued until the broker is up)"),
+    ("mqtt_connected", "broker connected and queued messages flushed"),
+    ("ready", "READY=1 sent to systemd"),
+]
+TOP_IMPORTS = 6
+RUN_TIMEOUT_SECONDS = 30.0
+# The bridge process imports main.py before anything else (this module included),
+# so that its import time is measured as on a real start
+CHILD_BOOTSTRAP = (
+    "import time; started = time.monotonic(); import main; imported = time.monotonic(); "
+    "import sys, bench_startup; bench_startup.run_child(float(sys.argv[1]), sys.argv[2], started, imported)"
+)
+
+
+# --- Bridge process ---
+def run_child(spawned_at, broker, started, imported):
+    marks = {"interpreter": started, "imported": imported}
+
+    def mark(name):
+        marks.setdefault(name, time.monotonic())
+        # Readiness doesn't wait for the broker, so with a real one both may come in either order
+        if "ready" in marks and ("mqtt_connected" in marks or not broker):
+            report(spawned_at, marks)
+
+    import main
+    from dbus_next.aio import MessageBus
+    from mocks import MqttStandIn
+
+    if broker:
+        main.MQTT_BROKER_HOST, _, port = broker.partition(':')
+        main.MQTT_BROKER_PORT = int(port or 1883)
+    else:
+        main.MqttTransport = lambda *args: MqttStandIn()
+
+    # Wrap the steps of interest in place, so main_loop itself runs unmodified
+    def after(owner, name, phase):
+        original = getattr(owner, name)
+
+        async def wrapper(*args, **kwargs):
+            result = await original(*args, **kwargs)
+            mark(phase)
+            return result
+        setattr(owner, name, wrapper)
+
+    after(MessageBus, 'connect', "dbus_connected")
+    after(main.MprisBridge, 'list_services', "players_listed")
+    after(main.MprisBridge, 'publish_active', "status_published")
+    if broker:
+        after(main.MqttTransport, '_flush', "mqtt_connected")
+
+    def notify(*states):
+        if "READY=1" in states:
+            mark("ready")
+        return True
+    main.sd_notify.notify = notify
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main.main_loop())
+
+
+def report(spawned_at, marks):
+    print(json.dumps({name: (t - spawned_at) * 1000 for name, t in marks.items()}), flush=True)
+    os._exit(0)
+
+
+# --- Measurement ---
+def parse_import_times(stderr):
+    """Returns {module: cumulative ms} for the modules main.py imports directly."""
+    # Lines look like "import time:       405 |      17212 |   dbus_next", indented by nesting
+    # depth. A module's own imports are listed right before it.
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue # Header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            times[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == 'main':
+                return times
+            times = {}
+    return {}
+
+
+async def measure(address, broker):
+    env = dict(os.environ, DBUS_SESSION_BUS_ADDRESS=address)
+    spawned_at = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-X", "importtime", "-c", CHILD_BOOTSTRAP, repr(spawned_at), broker or "",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), RUN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        raise RuntimeError(f"The bridge did not become ready within {RUN_TIMEOUT_SECONDS:.0f}s")
+    if not stdout.strip():
+        raise RuntimeError(f"The bridge exited without reporting:\n{stderr.decode()[-2000:]}")
+    return json.loads(stdout.decode().splitlines()[-1]), parse_import_times(stderr.decode())
+
+
+async def run(args):
+    from mocks import MockPlayer, PrivateBus
+
+    async with PrivateBus() as private_bus:
+        for index in range(args.players):
+            await MockPlayer(f"startup{index}", {
+                "PlaybackStatus": "Playing" if index == 0 else "Paused",
+                "Metadata": {"mpris:trackid": f"/org/mpris/MediaPlayer2/startup/{index}",
+                             "xesam:title": f"Track {index}", "xesam:artist": ["Startup bench"]},
+            }).connect(private_bus.address)
+
+        runs = [await measure(private_bus.address, args.broker) for _ in range(args.runs)]
+
+    print(f"{args.runs} runs, {args.players} players, MQTT: {args.broker or 'in-process stand-in'}")
+    print(f"{'phase':<18} {'at ms':>8} {'step ms':>8}  description")
+    previous = 0.0
+    for name, description in PHASES:
+        if not all(name in marks for marks, _ in runs):
+            print(f"{name:<18} {'n/a':>8} {'':>8}  {description}") # No broker with the stand-in
+            continue
+        at = statistics.median(marks[name] for marks, _ in runs)
+        print(f"{name:<18} {at:>8.1f} {at - previous:>+8.1f}  {description}")
+        previous = max(previous, at)
+
+    print("\nSlowest imports of main.py (cumulative ms):")
+    modules = {module for _, imports in runs for module in imports}
+    medians = {m: statistics.median(imports.get(m, 0.0) for _, imports in runs) for m in modules}
+    for module, ms in sorted(medians.items(), key=lambda item: -item[1])[:TOP_IMPORTS]:
+        print(f"  {module:<24} {ms:>8.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the bridge's time from process start to first publish.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--players", type=int, default=3, help="mock players on the bus")
+    parser.add_argument("--broker", help="host:port of a real MQTT broker (default: in-process stand-in)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # The mock players log an EOFError for every bridge process that exits and when the bus shuts down
+    logging.getLogger().setLevel(logging.CRITICAL)
+    asyncio.run(run(parse_args()))
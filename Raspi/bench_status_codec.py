@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# bench_status_codec.py
+
+"""
+Compares the JSON status payload with the binary layout from status_codec.py:
+encoded size and encode/decode time per message.
+
+    python3 bench_status_codec.py [iterations]
+"""
+
+import json
+import sys
+import timeit
+
+from status_codec import decode_status, encode_status
+
+SAMPLE_STATUS = {
+    "status": "Playing",
+    "title": "Brother Louie Mix '98 (feat. Eric Singleton) - Radio Edit",
+    "artist": "Modern Talking, Eric Singleton",
+    "player": "Ubuntu PC",
+    "album_art_url": "https://i.scdn.co/image/ab67616d0000b273e4b4ac4e0c2a5d1f2f4f6a1b",
+    "length": 222,
+    "elapsed": 42.317,
+    "elapsed_timestamp": 1760700000.125,
+    "rate": 1.0,
+}
+
+
+def bench(label, func, iterations):
+    seconds = timeit.timeit(func, number=iterations)
+    print(f"  {label:<8} {seconds / iterations * 1e6:8.2f} us/op")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    json_bytes = json.dumps(SAMPLE_STATUS, ensure_ascii=False).encode('utf-8')
+    binary_bytes = encode_status(SAMPLE_STATUS)
+    assert decode_status(binary_bytes)["title"] == SAMPLE_STATUS["title"]
+
+    print(f"Payload size: JSON {len(json_bytes)} bytes, binary {len(binary_bytes)} bytes "
+          f"({len(binary_bytes) / len(json_bytes):.0%})")
+    print(f"JSON ({iterations} iterations):")
+    bench("encode", lambda: json.dumps(SAMPLE_STATUS, ensure_ascii=False).encode('utf-8'), iterations)
+    bench("decode", lambda: json.loads(json_bytes), iterations)
+    print(f"Binary ({iterations} iterations):")
+    bench("encode", lambda: encode_status(SAMPLE_STATUS), iterations)
+    bench("decode", lambda: decode_status(binary_bytes), iterations)
+
+
+if __name__ == '__main__':
+    main()
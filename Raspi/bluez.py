@@ -0,0 +1,266 @@
+# bluez.py
+
+"""
+Bluetooth (AVRCP) playback sources for the bridge.
+
+A phone that plays to the desk over Bluetooth shows up in BlueZ as an
+org.bluez.MediaPlayer1 object on the system bus. BluezPlayers mirrors these
+objects from the ObjectManager's InterfacesAdded/InterfacesRemoved and
+PropertiesChanged signals, so it never polls. It presents each one as an
+MPRIS player would look:
+
+- The properties are in the shape of org.mpris.MediaPlayer2.Player.
+- The service name is in the MPRIS namespace, e.g.
+  org.mpris.MediaPlayer2.bluez.dev_AA_BB_CC_DD_EE_FF.
+- BluezPlayer is a control object with the methods of main.MprisPlayer.
+
+The bridge can therefore treat phones like any other player. AVRCP has no
+seeking and no PlayPause, so PlayPause is sent as Play or Pause. The volume
+is that of the device's org.bluez.MediaTransport1, if the phone supports
+absolute volume.
+"""
+
+import asyncio
+import logging
+import time
+
+from dbus_next import ErrorType, MessageType, Variant
+from dbus_next.errors import DBusError
+
+from dbus_calls import DBUS_NAME, DBUS_PATH, PROPERTIES_IFACE, dbus_call, unpack_variants
+
+BLUEZ_NAME = 'org.bluez'
+PLAYER_IFACE = 'org.bluez.MediaPlayer1'
+TRANSPORT_IFACE = 'org.bluez.MediaTransport1'
+OBJECT_MANAGER_IFACE = 'org.freedesktop.DBus.ObjectManager'
+SERVICE_PREFIX = 'org.mpris.MediaPlayer2.bluez.'
+MAX_VOLUME = 127 # MediaTransport1.Volume is 0-127, as in AVRCP
+NOT_SUPPORTED = 'org.bluez.Error.NotSupported'
+RESCAN_DELAY_SECONDS = 5.0 # Retry after BlueZ didn't answer GetManagedObjects in time
+
+MATCH_RULES = [
+    f"type='signal',sender='{BLUEZ_NAME}',interface='{OBJECT_MANAGER_IFACE}'",
+    f"type='signal',sender='{BLUEZ_NAME}',interface='{PROPERTIES_IFACE}',member='PropertiesChanged',"
+    f"arg0='{PLAYER_IFACE}'",
+    f"type='signal',sender='{BLUEZ_NAME}',interface='{PROPERTIES_IFACE}',member='PropertiesChanged',"
+    f"arg0='{TRANSPORT_IFACE}'",
+    f"type='signal',sender='{DBUS_NAME}',interface='{DBUS_NAME}',member='NameOwnerChanged',arg0='{BLUEZ_NAME}'",
+]
+
+# MediaPlayer1.Status -> PlaybackStatus
+_STATUS = {
+    "playing": "Playing", "forward-seek": "Playing", "reverse-seek": "Playing",
+    "paused": "Paused", "stopped": "Stopped", "error": "Stopped",
+}
+_COMMANDS = {"Play", "Pause", "Stop", "Next", "Previous"}
+
+
+def service_name_for(path):
+    """/org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF/player0 -> org.mpris.MediaPlayer2.bluez.dev_AA_BB_CC_DD_EE_FF"""
+    device, _, player = path.rpartition('/')
+    device = device.rpartition('/')[2]
+    return SERVICE_PREFIX + (device if player == 'player0' else f"{device}_{player}")
+
+
+class BluezPlayers:
+    """Mirror of BlueZ's media players and transports, kept current by signals alone."""
+
+    def __init__(self, bus, timeout=2.0, on_change=None):
+        self.bus = bus # System bus connection of its own
+        self.timeout = timeout
+        self.on_change = on_change # Called whenever a player appears, changes or vanishes
+        self._players = {} # player path -> MediaPlayer1 properties
+        self._transports = {} # transport path -> MediaTransport1 properties
+        self._anchors = {} # player path -> (position in ms, monotonic time it was valid)
+        self._paths = {} # service name -> player path
+        self._controls = {} # player path -> BluezPlayer
+
+    def __contains__(self, service_name):
+        return service_name in self._paths
+
+    async def start(self):
+        self.bus.add_message_handler(self._on_message)
+        await asyncio.gather(*(self.call(DBUS_NAME, DBUS_PATH, DBUS_NAME, 'AddMatch', 's', [rule])
+                               for rule in MATCH_RULES))
+        await self.scan()
+
+    async def call(self, destination, path, interface, member, signature='', body=None):
+        return await dbus_call(self.bus, destination, path, interface, member, signature, body, timeout=self.timeout)
+
+    async def scan(self):
+        """Replaces the mirror with the objects BlueZ has right now."""
+        try:
+            objects = unpack_variants((await self.call(BLUEZ_NAME, '/', OBJECT_MANAGER_IFACE, 'GetManagedObjects'))[0])
+        except DBusError as e:
+            logging.warning(f"BlueZ is not available ({e.text}); waiting for it to start.")
+            objects = {}
+        except asyncio.TimeoutError:
+            # Also runs unawaited after a restart of bluetoothd, so nothing may escape from here
+            logging.warning(f"BlueZ did not list its objects in time; retrying in {RESCAN_DELAY_SECONDS:.0f}s.")
+            asyncio.get_running_loop().call_later(RESCAN_DELAY_SECONDS, lambda: asyncio.ensure_future(self.scan()))
+            objects = {}
+        self._players.clear()
+        self._transports.clear()
+        self._anchors.clear()
+        self._paths.clear()
+        self._controls.clear()
+        for path, interfaces in objects.items():
+            self._add(path, interfaces)
+        logging.info(f"Found {len(self._players)} Bluetooth player(s).")
+        self._changed()
+
+    # --- Signal Handlers ---
+    def _on_message(self, message):
+        if message.message_type != MessageType.SIGNAL:
+            return
+        if message.member == 'InterfacesAdded' and message.interface == OBJECT_MANAGER_IFACE:
+            path, interfaces = message.body
+            if self._add(path, unpack_variants(interfaces)):
+                self._changed()
+        elif message.member == 'InterfacesRemoved' and message.interface == OBJECT_MANAGER_IFACE:
+            path, interfaces = message.body
+            if TRANSPORT_IFACE in interfaces:
+                self._transports.pop(path, None)
+            if PLAYER_IFACE in interfaces and self._players.pop(path, None) is not None:
+                self._anchors.pop(path, None)
+                self._paths.pop(service_name_for(path), None)
+                self._controls.pop(path, None)
+                logging.info(f"Bluetooth player vanished: {path}")
+            self._changed()
+        elif message.member == 'PropertiesChanged' and message.interface == PROPERTIES_IFACE:
+            interface, changed, invalidated = message.body
+            if interface == PLAYER_IFACE and message.path in self._players:
+                self._update_player(message.path, unpack_variants(changed), invalidated)
+            elif interface == TRANSPORT_IFACE and message.path in self._transports:
+                self._transports[message.path].update(unpack_variants(changed))
+            else:
+                return
+            self._changed()
+        elif message.member == 'NameOwnerChanged' and message.body[0] == BLUEZ_NAME:
+            # bluetoothd (re)started or stopped: start over
+            asyncio.ensure_future(self.scan())
+
+    def _add(self, path, interfaces):
+        """Mirrors the objects of an InterfacesAdded. Returns True if one of them is of interest."""
+        if TRANSPORT_IFACE in interfaces:
+            self._transports[path] = dict(interfaces[TRANSPORT_IFACE])
+        if PLAYER_IFACE not in interfaces:
+            return TRANSPORT_IFACE in interfaces
+        props = dict(interfaces[PLAYER_IFACE])
+        self._players[path] = props
+        self._anchors[path] = (props.get('Position'), time.monotonic())
+        self._paths[service_name_for(path)] = path
+        logging.info(f"Bluetooth player appeared: {path} ({props.get('Name', 'unnamed')})")
+        return True
+
+    def _update_player(self, path, changed, invalidated):
+        props = self._players[path]
+        now = time.monotonic()
+        if 'Position' in changed:
+            self._anchors[path] = (changed['Position'], now)
+        elif 'Status' in changed:
+            # BlueZ doesn't always report the position along with a pause, so freeze it here
+            self._anchors[path] = (self._position(path, now), now)
+        props.update(changed)
+        for name in invalidated:
+            props.pop(name, None)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    # --- Normalized view ---
+    def _position(self, path, now):
+        """Current position in ms, extrapolated from the last reported one while playing."""
+        position, valid_at = self._anchors.get(path, (None, now))
+        if position is None:
+            return None
+        if _STATUS.get(self._players[path].get('Status')) == 'Playing':
+            position += (now - valid_at) * 1000
+        return position
+
+    def transport_of(self, path):
+        """Returns the transport path of the player's device, or None."""
+        device = self._players.get(path, {}).get('Device')
+        return next((p for p, props in self._transports.items() if device and props.get('Device') == device), None)
+
+    def volume(self, path):
+        transport = self.transport_of(path)
+        volume = self._transports[transport].get('Volume') if transport else None
+        return volume / MAX_VOLUME if volume is not None else None
+
+    def status(self, path):
+        return _STATUS.get(self._players[path].get('Status'), 'Stopped')
+
+    def properties(self, path):
+        """Returns the player's state in the shape of the MPRIS Player properties."""
+        track = self._players[path].get('Track', {})
+        metadata = {}
+        if track.get('Title'):
+            metadata['xesam:title'] = track['Title']
+        if track.get('Artist'):
+            metadata['xesam:artist'] = [track['Artist']]
+        if track.get('Album'):
+            metadata['xesam:album'] = track['Album']
+        if track.get('Duration'):
+            metadata['mpris:length'] = track['Duration'] * 1000
+        props = {'PlaybackStatus': self.status(path), 'Metadata': metadata, 'Rate': 1.0}
+        position = self._position(path, time.monotonic())
+        if position is not None:
+            props['Position'] = int(position * 1000)
+        volume = self.volume(path)
+        if volume is not None:
+            props['Volume'] = volume
+        return props
+
+    def players(self):
+        """Returns {service name: MPRIS-shaped properties} of every Bluetooth player."""
+        return {service_name: self.properties(path) for service_name, path in self._paths.items()}
+
+    def get(self, service_name):
+        """Returns the control object for service_name; raises KeyError if there is no such player."""
+        path = self._paths[service_name]
+        control = self._controls.get(path)
+        if control is None:
+            control = self._controls[path] = BluezPlayer(self, service_name, path)
+        return control
+
+
+class BluezPlayer:
+    """Controls one Bluetooth player through the same methods as main.MprisPlayer."""
+
+    def __init__(self, players, service_name, path):
+        self.players = players
+        self.service_name = service_name
+        self.path = path
+
+    @property
+    def volume(self):
+        return self.players.volume(self.path)
+
+    @volume.setter
+    def volume(self, value):
+        pass # BlueZ reports every volume change, so the mirrored transport volume is always current
+
+    async def method(self, member, signature='', body=None):
+        if member == 'PlayPause':
+            member = 'Pause' if self.players.status(self.path) == 'Playing' else 'Play'
+        if member not in _COMMANDS:
+            raise DBusError(NOT_SUPPORTED, f"{member} is not supported over Bluetooth")
+        await self.players.call(BLUEZ_NAME, self.path, PLAYER_IFACE, member)
+
+    async def get(self, prop):
+        props = self.players.properties(self.path)
+        if prop not in props:
+            raise DBusError(NOT_SUPPORTED, f"{prop} is not available over Bluetooth")
+        return props[prop]
+
+    async def set(self, prop, signature, value):
+        if prop != 'Volume' or self.players.volume(self.path) is None:
+            raise DBusError(NOT_SUPPORTED, f"Setting {prop} is not supported by this Bluetooth device")
+        await self.players.call(BLUEZ_NAME, self.players.transport_of(self.path), PROPERTIES_IFACE, 'Set', 'ssv',
+                                [TRANSPORT_IFACE, 'Volume', Variant('q', round(value * MAX_VOLUME))])
+
+    async def tracks(self):
+        # Same error as an MPRIS player without the TrackList interface, so the bridge stops asking
+        raise DBusError(ErrorType.UNKNOWN_INTERFACE, "Bluetooth players have no track list")
@@ -0,0 +1,55 @@
+# dbus_calls.py
+
+"""
+D-Bus helpers shared by the bridge (session bus) and bluez.py (system bus).
+
+dbus_call sends one raw method call with a deadline. Its latency goes into
+DBUS_CALL_SECONDS, which main.py serves along with its other metrics, so
+calls to players, to the bus daemons and to BlueZ all show up in one place.
+"""
+
+import asyncio
+import time
+
+from dbus_next import Message, MessageType, Variant
+from dbus_next.errors import DBusError
+
+from metrics import Histogram
+
+PROPERTIES_IFACE = 'org.freedesktop.DBus.Properties'
+DBUS_NAME = 'org.freedesktop.DBus'
+DBUS_PATH = '/org/freedesktop/DBus'
+DEFAULT_TIMEOUT_SECONDS = 2.0
+
+DBUS_CALL_SECONDS = Histogram(
+    "mpris_bridge_dbus_call_seconds", "Duration of D-Bus method calls, errors and timeouts included", ("member", "peer"))
+
+
+def unpack_variants(value):
+    """Recursively replaces dbus_next Variants with their plain Python values."""
+    if isinstance(value, Variant):
+        return unpack_variants(value.value)
+    if isinstance(value, dict):
+        return {k: unpack_variants(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [unpack_variants(v) for v in value]
+    return value
+
+
+async def dbus_call(bus, destination, path, interface, member, signature='', body=None,
+                    timeout=DEFAULT_TIMEOUT_SECONDS, peer=None):
+    """
+    Sends one method call and returns the reply body, raising DBusError on error replies.
+    The latency is recorded under peer, which defaults to the destination.
+    """
+    started = time.monotonic()
+    try:
+        reply = await asyncio.wait_for(bus.call(Message(
+            destination=destination, path=path, interface=interface, member=member,
+            signature=signature, body=body or []
+        )), timeout)
+    finally:
+        DBUS_CALL_SECONDS.observe(time.monotonic() - started, member, peer or destination)
+    if reply.message_type == MessageType.ERROR:
+        raise DBusError(reply.error_name, reply.body[0] if reply.body else '')
+    return reply.body
@@ -0,0 +1,122 @@
+# event_stream.py
+
+"""
+Server-Sent Events for dashboards on the local network.
+
+EventStream writes every event to all connected clients the moment the bridge
+publishes it, straight from the bridge's event loop, without a detour through
+the MQTT broker. The most recent events are kept in a small replay buffer:
+
+- A client reconnecting with a Last-Event-ID header (EventSource sends it
+  automatically) gets the events it missed, if they are still buffered.
+- Any other client first gets the latest event of every type, i.e. the
+  current state, much like retained MQTT messages.
+
+A client that stops reading is disconnected once its send buffer exceeds
+MAX_CLIENT_BUFFER_BYTES; its EventSource reconnects and catches up from the
+replay buffer.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from http_server import Response
+
+EVENTS_ROUTE = "/events"
+CONTENT_TYPE = "text/event-stream; charset=utf-8"
+KEEPALIVE_SECONDS = 15.0 # Comment lines that keep proxies from closing idle streams and detect dead clients
+RETRY_MILLISECONDS = 1000 # Reconnect delay suggested to EventSource
+MAX_CLIENT_BUFFER_BYTES = 256 * 1024
+
+_HEAD = (
+    "HTTP/1.1 200 OK\r\n"
+    f"Content-Type: {CONTENT_TYPE}\r\n"
+    "Cache-Control: no-cache\r\n"
+    "Connection: keep-alive\r\n"
+    "Access-Control-Allow-Origin: *\r\n"
+    "\r\n"
+    f"retry: {RETRY_MILLISECONDS}\n\n"
+).encode('latin-1')
+
+
+def _format(event_id, event, data):
+    lines = [f"id: {event_id}", f"event: {event}"] + [f"data: {line}" for line in data.split('\n')]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class EventStream:
+    """Fans events out to Server-Sent Events clients and replays recent ones to clients that (re)connect."""
+
+    def __init__(self, replay_size=32):
+        self._events = deque(maxlen=replay_size) # (id, event, data), oldest first
+        self._latest = {} # event -> (id, event, data)
+        # Ids count up from the start time in microseconds, so they keep increasing across restarts
+        # of the bridge and a client's Last-Event-ID from before a restart is never mistaken for a new one
+        self._next_id = time.time_ns() // 1000
+        self._clients = set() # StreamWriters of connected clients
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def publish(self, event, data):
+        """Sends data (a str, usually JSON) to every client, unless it repeats the latest event of its type."""
+        latest = self._latest.get(event)
+        if latest and latest[2] == data:
+            return
+        entry = (self._next_id, event, data)
+        self._next_id += 1
+        self._events.append(entry)
+        self._latest[event] = entry
+        message = _format(*entry)
+        for writer in list(self._clients):
+            self._send(writer, message)
+
+    def _send(self, writer, message):
+        if writer.is_closing():
+            self._drop(writer)
+        elif writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER_BYTES:
+            # Closing would wait for the buffer to drain, which a stalled client never does
+            writer.transport.abort()
+            self._drop(writer)
+        else:
+            writer.write(message)
+
+    def _drop(self, writer):
+        self._clients.discard(writer)
+        if not writer.is_closing():
+            writer.close()
+
+    def _backlog(self, last_event_id):
+        """Returns the events a client that has seen everything up to last_event_id needs first."""
+        if last_event_id is not None and self._events \
+                and self._events[0][0] - 1 <= last_event_id <= self._events[-1][0]:
+            return [entry for entry in self._events if entry[0] > last_event_id]
+        # New client, or it missed more than the buffer holds: start from the current state
+        return sorted(self._latest.values())
+
+    async def handle_request(self, request):
+        """HttpServer route for EVENTS_ROUTE. Takes over the connection and streams until the client leaves."""
+        if request.method == "HEAD":
+            return Response(200, b"", CONTENT_TYPE)
+        # Browsers send the header on reconnect; ?last_event_id= lets a page resume after a reload
+        last_event_id = request.headers.get('last-event-id') or request.query.get('last_event_id', [None])[0]
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        writer = request.writer
+        writer.write(_HEAD + b''.join(_format(*entry) for entry in self._backlog(last_event_id)))
+        self._clients.add(writer)
+        try:
+            while not writer.is_closing():
+                await writer.drain()
+                await asyncio.sleep(KEEPALIVE_SECONDS)
+                self._send(writer, b": keepalive\n\n")
+        except ConnectionError:
+            pass
+        finally:
+            self._drop(writer)
+        return None # The connection is closed; nothing left for HttpServer to send
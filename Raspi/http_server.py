@@ -0,0 +1,125 @@
+# http_server.py
+
+"""
+A deliberately small HTTP/1.1 server on top of asyncio streams, so the bridge
+can serve a few local endpoints from its own event loop without pulling in a
+web framework.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+REQUEST_TIMEOUT_SECONDS = 5.0
+MAX_HEADER_LINES = 64
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, list]
+    headers: Dict[str, str]
+    # Handlers that stream (e.g. Server-Sent Events) write to this directly
+    writer: asyncio.StreamWriter
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class HttpServer:
+    """
+    Routes requests by path to async handlers. A route ending in '/' matches
+    every path below it. A handler returns a Response, or None if it has taken
+    over the connection (streaming) and will close it itself.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._routes = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, path, handler):
+        self._routes[path] = handler
+
+    def _find_handler(self, path):
+        handler = self._routes.get(path)
+        if handler:
+            return handler
+        prefixes = [p for p in self._routes if p.endswith('/') and path.startswith(p)]
+        return self._routes[max(prefixes, key=len)] if prefixes else None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logging.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def _read_request(self, reader, writer):
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        if not request_line:
+            return None
+        method, target, _version = request_line.split(' ', 2)
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        return Request(method=method, path=url.path, query=parse_qs(url.query), headers=headers, writer=writer)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader, writer), REQUEST_TIMEOUT_SECONDS)
+            except (ValueError, asyncio.TimeoutError):
+                request = None
+                await self._send(writer, Response(400, b"Bad request\n"))
+            if request is None:
+                return
+
+            handler = self._find_handler(request.path)
+            if handler is None:
+                response = Response(404, b"Not found\n")
+            elif request.method not in ("GET", "HEAD"):
+                response = Response(405, b"Method not allowed\n")
+            else:
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    logging.error(f"HTTP handler error for '{request.path}': {e}", exc_info=True)
+                    response = Response(500, b"Internal server error\n")
+            if response is None:
+                return # Streaming handler owns the connection
+            if request.method == "HEAD":
+                response = Response(response.status, b"", response.content_type,
+                                    {**response.headers, "Content-Length": str(len(response.body))})
+            await self._send(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            if not writer.is_closing():
+                writer.close()
+
+    @staticmethod
+    async def _send(writer, response):
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(response.body)),
+            "Connection": "close",
+            **response.headers,
+        }
+        head = f"HTTP/1.1 {response.status} {_REASONS.get(response.status, '')}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + response.body)
+        await writer.drain()
@@ -1,11 +1,32 @@
 #!/usr/bin/env python3
 
-import pydbus
-import time
-import paho.mqtt.client as mqtt_client
+import asyncio
 import json
 import logging
+import math
 import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import aiomqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+from dbus_next import BusType, ErrorType, MessageType, Variant
+from dbus_next.aio import MessageBus
+from dbus_next.errors import DBusError
+
+import sd_notify
+from bluez import BluezPlayers
+from dbus_calls import DBUS_CALL_SECONDS, DBUS_NAME, DBUS_PATH, PROPERTIES_IFACE, dbus_call, unpack_variants
+from event_stream import EVENTS_ROUTE, EventStream
+from http_server import HttpServer
+from metrics import METRICS_ROUTE, MetricsRegistry
+from mqtt_transport import MqttTransport
+from status_codec import encode_status
+from telemetry import HostTelemetry
+# artwork (Pillow) and spectrum (NumPy) are imported in main_loop, and only when enabled:
+# on a Pi Zero importing them takes longer than the rest of the startup
 
 # --- Configuration ---
 MQTT_BROKER_HOST = "192.168.178.15" # put your broker address here
@@ -13,140 +34,468 @@ MQTT_BROKER_PORT = 1883
 MQTT_USERNAME = "mqtt" # put your broker username here
 MQTT_PASSWORD = "mqtt"  # put your broker password here
 MQTT_TOPIC = "music/status"
+# MQTT v5 lets a command carry ResponseTopic/CorrelationData; the bridge then replies with the
+# outcome and the measured execution latency. Disable for brokers that only speak 3.1.1.
+MQTT_V5_ENABLED = True
+# Persistent session: the broker keeps the subscriptions and queues QoS 1 commands for this long
+# while the bridge is offline (MQTT v5; with 3.1.1 the broker's own expiry applies)
+MQTT_SESSION_EXPIRY_SECONDS = 3600
+MQTT_RECONNECT_MIN_SECONDS = 1 # Reconnect backoff doubles from MIN up to MAX
+MQTT_RECONNECT_MAX_SECONDS = 60
+MQTT_OUTBOX_SIZE = 64 # Topics buffered while offline; only the latest payload per topic is kept
+# "aggregate": the whole JSON document on MQTT_TOPIC (default)
+# "fields":    every changed field as plain text on its own retained MQTT_TOPIC/<field> topic
+# "both":      both of the above
+# With AGGREGATION_ENABLED the JSON document is always published, as the hosts rely on it.
+STATUS_PUBLISH_MODE = "aggregate"
+# Additionally publish the status in the compact binary layout from status_codec.py
+BINARY_STATUS_ENABLED = False
+BINARY_STATUS_TOPIC = "music/status/bin"
+
+# Title, artist, art URL and length of the upcoming track, read from the MPRIS TrackList
+# interface of players that implement it, so consumers can pre-fetch art before the track changes
+NEXT_TRACK_ENABLED = True
+NEXT_TRACK_TOPIC = "music/status/next"
+
+# Retained JSON list of the players on this host, for addressing them on the per-player
+# control topics (music/control/<player>/<command>, e.g. music/control/spotify/playpause)
+PLAYERS_TOPIC = "music/players"
+
+# Also treat phones playing over Bluetooth (AVRCP) as players, from BlueZ's org.bluez.MediaPlayer1
+# objects on the system bus. They are named bluez.dev_<address>; seeking is not available over AVRCP.
+BLUEZ_ENABLED = False
+
+# --- Multi-host aggregation ---
+# With bridges on several hosts, enable AGGREGATION_ENABLED on all of them: each bridge then
+# publishes its own status to HOST_STATUS_TOPIC/<CLIENT_ID>, and the one bridge that also has
+# AGGREGATOR_ENABLED publishes the canonical MQTT_TOPIC for the globally active host.
+# Commands are only executed by the bridge whose host is the active one.
+AGGREGATION_ENABLED = False
+AGGREGATOR_ENABLED = False
+HOST_STATUS_TOPIC = "music/status/hosts"
+
+# --- Local artwork ---
+# Serve file:// art URLs (VLC, Rhythmbox, mpv, ...) over HTTP so the UI server can fetch them.
+# Needs Pillow; without it such URLs are forwarded unchanged.
+LOCAL_ARTWORK_ENABLED = False
+ARTWORK_CACHE_DIR = "artwork_cache"
+ARTWORK_SIZE = 400 # Longest side in pixels
+
+# --- Metrics ---
+# Serve OpenMetrics (Prometheus) metrics on http://<host>:HTTP_PORT/metrics
+METRICS_ENABLED = False
+
+# --- Spectrum / VU meter ---
+# Stream log-spaced spectrum bands plus peak and RMS levels of what is currently playing as small
+# binary frames (layout in spectrum.py) for the ESP32 to draw. Needs NumPy and PulseAudio's parec
+# (also available on PipeWire through pipewire-pulse). Frames are sent with QoS 0 and not retained.
+SPECTRUM_ENABLED = False
+SPECTRUM_TOPIC = "music/spectrum"
+SPECTRUM_FPS = 30 # 20-60
+SPECTRUM_BANDS = 16
+SPECTRUM_SAMPLE_RATE = 44100
+# Raw 16-bit little-endian mono samples of the default output's monitor on stdout. On plain PipeWire:
+# ["pw-record", "-P", "{ stream.capture.sink=true }", "--format=s16", f"--rate={SPECTRUM_SAMPLE_RATE}",
+#  "--channels=1", "-"]
+SPECTRUM_CAPTURE_COMMAND = ["parec", "--device=@DEFAULT_MONITOR@", "--format=s16le",
+                            f"--rate={SPECTRUM_SAMPLE_RATE}", "--channels=1", "--latency-msec=20"]
+
+# --- Host telemetry ---
+# Publish this host's hottest thermal zone (°C) and CPU load (%) as compact retained JSON such as
+# {"temp":48.3,"load":12.5} on TELEMETRY_TOPIC/<CLIENT_ID>, for the ESP32 fan controller (fan_control.md).
+# Readings come every TELEMETRY_MIN_INTERVAL_SECONDS while the temperature or load is changing and
+# back off to TELEMETRY_MAX_INTERVAL_SECONDS while both are stable.
+TELEMETRY_ENABLED = False
+TELEMETRY_TOPIC = "desk/telemetry"
+TELEMETRY_MIN_INTERVAL_SECONDS = 0.5
+TELEMETRY_MAX_INTERVAL_SECONDS = 10.0
+
+# --- Event stream ---
+# Serve the status (with its position anchor), the players list and the next track as Server-Sent
+# Events on http://<host>:HTTP_PORT/events, so dashboards on the LAN get them without the broker
+EVENT_STREAM_ENABLED = False
+EVENT_STREAM_REPLAY_SIZE = 32 # Recent events a reconnecting client can catch up on
+
+# --- HTTP server (local artwork, metrics, event stream) ---
+HTTP_HOST = "0.0.0.0"
+HTTP_PORT = 8010
+HTTP_HOST_IP = "192.168.178.20" # Address of this machine as seen by the UI server
 CLIENT_ID = "ubuntu_pc"
-CHECK_INTERVAL_SECONDS = 0.5
+SAFETY_POLL_INTERVAL_SECONDS = 30 # Fallback poll for players that don't emit signals reliably
+SIGNAL_DEBOUNCE_SECONDS = 0.05 # Signals arriving within this window are handled with a single refresh
+POSITION_DRIFT_TOLERANCE_SECONDS = 1.5 # Larger deviations from the extrapolated position count as a seek
+ARBITRATION_HOLD_SECONDS = 3.0 # Minimum time between two switches of the active player
+
+# --- Timeouts ---
+DBUS_CALL_TIMEOUT_SECONDS = 2.0 # Upper bound for a single D-Bus method call to the bus daemon
+PLAYER_CALL_TIMEOUT_SECONDS = 0.3 # Upper bound for a single D-Bus method call to a player
+REFRESH_TIMEOUT_SECONDS = 5.0 # Upper bound for reading all players and publishing
+COMMAND_TIMEOUT_SECONDS = 3.0 # Upper bound for executing one control command
+MQTT_PUBLISH_TIMEOUT_SECONDS = 5.0
+
+# --- Unresponsive players ---
+# A player that lets this many calls in a row time out is quarantined: calls to it fail at once,
+# and it is left out of the status, so a frozen browser tab can't slow down the other players.
+# It is probed again after QUARANTINE_MIN_SECONDS, doubling up to QUARANTINE_MAX_SECONDS while it stays silent.
+QUARANTINE_AFTER_TIMEOUTS = 2
+QUARANTINE_MIN_SECONDS = 1.0
+QUARANTINE_MAX_SECONDS = 60.0
+
+# --- Command execution ---
+COMMAND_QUEUE_SIZE = 32 # Commands beyond this backlog are dropped
+# Only the latest value on these topics matters, so a burst (e.g. a fast encoder spin)
+# collapses into a single D-Bus call. All other topics are executed strictly in order.
+COALESCED_TOPICS = {"music/control/volume", "music/control/position"}
+# Payloads on these topics are deltas; a burst collapses into one call with the summed delta.
+ACCUMULATED_TOPICS = {"music/control/volume/step", "music/control/position/seek"}
+
+# --- D-Bus names ---
+MPRIS_BASE = 'org.mpris.MediaPlayer2'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_PLAYER_IFACE = 'org.mpris.MediaPlayer2.Player'
+MPRIS_TRACKLIST_IFACE = 'org.mpris.MediaPlayer2.TrackList'
+# Errors by which a player says it has no TrackList, as opposed to failing to read it this time
+NO_TRACKLIST_ERRORS = {ErrorType.UNKNOWN_INTERFACE.value, ErrorType.UNKNOWN_PROPERTY.value,
+                       ErrorType.UNKNOWN_METHOD.value}
+
+# Match rules for the signals the bridge reacts to (see MprisBridge.start)
+SIGNAL_MATCH_RULES = [
+    f"type='signal',interface='{PROPERTIES_IFACE}',member='PropertiesChanged',"
+    f"path='{MPRIS_PATH}',arg0='{MPRIS_PLAYER_IFACE}'",
+    f"type='signal',interface='{MPRIS_PLAYER_IFACE}',member='Seeked',path='{MPRIS_PATH}'",
+    f"type='signal',interface='{PROPERTIES_IFACE}',member='PropertiesChanged',"
+    f"path='{MPRIS_PATH}',arg0='{MPRIS_TRACKLIST_IFACE}'",
+    f"type='signal',interface='{MPRIS_TRACKLIST_IFACE}',path='{MPRIS_PATH}'",
+    f"type='signal',sender='{DBUS_NAME}',interface='{DBUS_NAME}',member='NameOwnerChanged',"
+    f"arg0namespace='{MPRIS_BASE}'",
+]
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# --- Callbacks (on_connect, on_subscribe, on_unsubscribe remain the same) ---
-def on_connect(client, userdata, flags, rc, properties=None):
-    if rc.is_failure:
-        logging.error(f"Failed to connect: {rc}.")
-    else:
-        logging.info(f"Connected successfully with code {rc}.")
-        # Create a list of tuples (topic, qos) for easy subscription
-        topics_to_subscribe = [
-            ("music/control/position", 1),
-            ("music/control/playpause", 1),
-            ("music/control/next", 1),
-            ("music/control/previous", 1),
-            ("music/control/volume", 1)
-        ]
-        client.subscribe(topics_to_subscribe)
+# --- Metrics ---
+METRICS = MetricsRegistry()
+METRICS.register(DBUS_CALL_SECONDS) # Recorded by dbus_call, for bluez.py as well
+REFRESH_SECONDS = METRICS.histogram(
+    "mpris_bridge_refresh_seconds", "Duration of one refresh: reading all players, arbitration and publishing")
+MQTT_PUBLISH_SECONDS = METRICS.histogram(
+    "mpris_bridge_mqtt_publish_seconds", "Duration of MQTT publishes until acknowledged by the broker", ("topic",))
+COMMANDS = METRICS.counter(
+    "mpris_bridge_commands", "Control commands by outcome (submitted, coalesced, dropped, executed)", ("outcome",))
+COMMAND_SECONDS = METRICS.histogram("mpris_bridge_command_seconds", "Execution time of control commands", ("topic",))
+COMMAND_ERRORS = METRICS.counter("mpris_bridge_command_errors", "Control commands that failed", ("topic",))
+COMMAND_QUEUE_DEPTH = METRICS.gauge("mpris_bridge_command_queue_depth", "Control commands waiting to be executed")
+QUARANTINED_PLAYERS = METRICS.gauge(
+    "mpris_bridge_quarantined_players", "Players left out because they stopped answering D-Bus calls")
 
-def on_subscribe(client, userdata, mid, reason_code_list, properties):
-    if reason_code_list[0].is_failure:
-        logging.error(f"Broker rejected you subscription: {reason_code_list[0]}")
-    else:
-        logging.info(f"Broker granted the following QoS: {reason_code_list[0].value}")
 
-def on_unsubscribe(client, userdata, mid, reason_code_list, properties):
-    if len(reason_code_list) == 0 or not reason_code_list[0].is_failure:
-        logging.info("unsubscribe succeeded (if SUBACK is received in MQTTv3 it success)")
-    else:
-        logging.error(f"Broker replied with failure: {reason_code_list[0]}")
-    client.disconnect()
+# --- D-Bus helpers ---
+def metric_peer(player_short_name):
+    """
+    Returns the name a player's latencies are recorded under. Browsers and some players register
+    one name per process (chromium.instance4242, firefox.instance_1_23), and metric series are
+    never dropped, so these are recorded under their base name (chromium, firefox).
+    """
+    return player_short_name.split('.instance', 1)[0]
+
+class PlayerQuarantined(Exception):
+    """Raised instead of calling a player that is quarantined for not answering."""
 
-def on_message(client, userdata, message):
+class CircuitBreaker:
     """
-    Dispatches incoming MQTT messages to the appropriate handler function.
+    Tracks whether one player answers its D-Bus calls.
+
+    After threshold consecutive timeouts the player is quarantined and
+    allow() refuses all calls. Once the quarantine is over, the player is due
+    for a single probe call. If the probe times out as well, the quarantine
+    is doubled (up to max_seconds); any reply, even an error reply, ends it.
+    The backoff is only forgotten once a regular call is answered, so a player
+    that answers probes but keeps timing out on refreshes is quarantined for
+    ever longer periods rather than lifted again every min_seconds.
     """
-    topic = message.topic
-    logging.info(f"Received message on topic '{topic}'")
-
-    # Look up the handler for the received topic
-    handler = TOPIC_HANDLERS.get(topic)
-    if handler:
-        bus = userdata.get('bus')
-        active_service_name = userdata.get('active_service_name')
-        if not active_service_name:
-            logging.warning(f"Command on topic '{topic}' ignored: no active player.")
-            return
+
+    def __init__(self, threshold=QUARANTINE_AFTER_TIMEOUTS, min_seconds=QUARANTINE_MIN_SECONDS,
+                 max_seconds=QUARANTINE_MAX_SECONDS):
+        self.threshold = threshold
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.timeouts = 0 # Consecutive timeouts
+        self.quarantine_seconds = 0.0
+        self.retry_at = None # Monotonic time at which the next probe is due, None unless quarantined
+
+    @property
+    def quarantined(self):
+        return self.retry_at is not None
+
+    def allow(self):
+        return self.retry_at is None
+
+    def start_probe(self, now=None):
+        """True if a probe is due; the next one is then only due after another quarantine period."""
+        now = time.monotonic() if now is None else now
+        if self.retry_at is None or now < self.retry_at:
+            return False
+        self.retry_at = now + self.quarantine_seconds
+        return True
+
+    def succeeded(self, probe=False):
+        """Records a reply. Returns True if that ended a quarantine."""
+        lifted = self.quarantined
+        self.timeouts = 0
+        if not probe:
+            self.quarantine_seconds = 0.0
+        self.retry_at = None
+        return lifted
+
+    def timed_out(self, probe=False, now=None):
+        """Records a timeout. Returns True if that started or extended a quarantine."""
+        now = time.monotonic() if now is None else now
+        self.timeouts += 1
+        if probe:
+            self.quarantine_seconds = min(self.quarantine_seconds * 2, self.max_seconds)
+        elif not self.quarantined and self.timeouts >= self.threshold:
+            # Picks up the backoff where it was if no regular call was answered since the last quarantine
+            self.quarantine_seconds = min(max(self.min_seconds, self.quarantine_seconds * 2), self.max_seconds)
+        else:
+            # Calls already in flight when the quarantine started don't extend it
+            return False
+        self.retry_at = now + self.quarantine_seconds
+        return True
+
+class MprisPlayer:
+    """
+    Async proxy for one MPRIS player, addressed by its unique bus name. It
+    sends plain method calls, so unlike a dbus-next proxy object it needs no
+    introspection round trip before it can be used. Every call has a deadline
+    of PLAYER_CALL_TIMEOUT_SECONDS and goes through the player's CircuitBreaker.
+    """
+
+    def __init__(self, bus, service_name, owner):
+        self.bus = bus
+        self.service_name = service_name
+        self.owner = owner
+        # Last known volume (0.0-1.0), kept up to date by refreshes and volume
+        # commands so relative steps don't need a read before the write.
+        self.volume = None
+        self.breaker = CircuitBreaker()
+
+    async def call(self, interface, member, signature='', body=None):
+        if not self.breaker.allow():
+            raise PlayerQuarantined(f"Player {self.service_name.replace('org.mpris.MediaPlayer2.', '')} "
+                                    f"is not responding.")
+        return await self._call(interface, member, signature, body)
+
+    async def _call(self, interface, member, signature='', body=None, probe=False):
+        # Unique names change with every restart of the player, so latencies are recorded by player name
+        player_short_name = self.service_name.replace('org.mpris.MediaPlayer2.', '')
         try:
-            # Call the responsible handler function
-            handler(bus, active_service_name, message.payload)
-        except Exception as e:
-            logging.error(f"Error in handler for topic '{topic}': {e}", exc_info=True)
-    else:
-        logging.warning(f"No handler found for topic '{topic}'.")
+            reply = await dbus_call(self.bus, self.owner, MPRIS_PATH, interface, member, signature, body,
+                                    timeout=PLAYER_CALL_TIMEOUT_SECONDS, peer=metric_peer(player_short_name))
+        except asyncio.TimeoutError:
+            if self.breaker.timed_out(probe):
+                logging.warning(f"Player {player_short_name} is not responding; quarantined for "
+                                f"{self.breaker.quarantine_seconds:.0f}s.")
+            raise
+        except DBusError:
+            self._answered(player_short_name, probe) # An error reply still comes from a responsive player
+            raise
+        self._answered(player_short_name, probe)
+        return reply
+
+    def _answered(self, player_short_name, probe):
+        if self.breaker.succeeded(probe):
+            logging.info(f"Player {player_short_name} is responding again; quarantine lifted.")
+
+    async def probe(self):
+        """
+        Sends one call to a quarantined player. Returns True if it answered. The probe is the
+        GetAll a refresh sends, as players can answer cheaper calls while that one still hangs.
+        """
+        try:
+            await self._call(PROPERTIES_IFACE, 'GetAll', 's', [MPRIS_PLAYER_IFACE], probe=True)
+        except asyncio.TimeoutError:
+            return False
+        except DBusError:
+            pass
+        return True
 
+    async def get_all(self):
+        """Returns all 'Player' properties as a plain dict."""
+        body = await self.call(PROPERTIES_IFACE, 'GetAll', 's', [MPRIS_PLAYER_IFACE])
+        return unpack_variants(body[0])
 
-def player_control(bus, service_name, command):
+    async def get(self, prop):
+        body = await self.call(PROPERTIES_IFACE, 'Get', 'ss', [MPRIS_PLAYER_IFACE, prop])
+        return unpack_variants(body[0])
+
+    async def set(self, prop, signature, value):
+        await self.call(PROPERTIES_IFACE, 'Set', 'ssv', [MPRIS_PLAYER_IFACE, prop, Variant(signature, value)])
+
+    async def method(self, member, signature='', body=None):
+        return await self.call(MPRIS_PLAYER_IFACE, member, signature, body)
+
+    async def tracks(self):
+        """Returns the track ids of the 'TrackList' interface; raises DBusError if the player has none."""
+        body = await self.call(PROPERTIES_IFACE, 'Get', 'ss', [MPRIS_TRACKLIST_IFACE, 'Tracks'])
+        return unpack_variants(body[0])
+
+    async def tracks_metadata(self, track_ids):
+        body = await self.call(MPRIS_TRACKLIST_IFACE, 'GetTracksMetadata', 'ao', [track_ids])
+        return unpack_variants(body[0])
+
+
+# --- Command handlers ---
+class CommandError(Exception):
+    """Raised by command handlers; the message is logged and sent back to the requester."""
+
+async def player_control(proxies, service_name, command):
     """A generic function to call simple, no-argument D-Bus methods."""
     if not service_name:
-        logging.warning(f"Player command '{command}' ignored: no active player.")
-        return
-        
+        raise CommandError(f"Player command '{command}' ignored: no active player.")
+
     player_short_name = service_name.replace('org.mpris.MediaPlayer2.', '')
     try:
-        proxy = bus.get(service_name, '/org/mpris/MediaPlayer2')
-        player_interface = proxy['org.mpris.MediaPlayer2.Player']
-        
-        # This uses getattr to call the method by its string name
-        method_to_call = getattr(player_interface, command)
-        method_to_call()
+        player = await proxies.get(service_name)
+        await player.method(command)
         logging.info(f"Executed '{command}' on player {player_short_name}.")
 
     except Exception as e:
-        logging.error(f"Failed to execute '{command}' for {player_short_name}: {e}")
+        raise CommandError(f"Failed to execute '{command}' for {player_short_name}: {e}") from e
 
-def handle_set_position(bus, active_service_name, payload):
-    """Handler for the 'music/position/set' topic."""
+async def handle_set_position(proxies, active_service_name, payload):
+    """Handler for the 'music/control/position' topic."""
     try:
         position_seconds = float(payload.decode())
-        if position_seconds < 0:
-            raise ValueError("Position must be non-negative")
+        if not (0 <= position_seconds < math.inf):
+            raise ValueError("Position must be a non-negative number")
         position_microseconds = int(position_seconds * 1_000_000)
-        set_player_position(bus, active_service_name, position_microseconds)
     except (ValueError, TypeError) as e:
-        logging.error(f"Invalid position value received ('{payload.decode()}'): {e}")
+        raise CommandError(f"Invalid position value received ('{payload.decode()}'): {e}") from e
+    await set_player_position(proxies, active_service_name, position_microseconds)
 
-def handle_play_pause(bus, active_service_name, payload):
+async def handle_play_pause(proxies, active_service_name, payload):
     """Handler for the 'music/control/playpause' topic."""
-    player_control(bus, active_service_name, "PlayPause")
+    await player_control(proxies, active_service_name, "PlayPause")
 
-def handle_next_track(bus, active_service_name, payload):
+async def handle_next_track(proxies, active_service_name, payload):
     """Handler for the 'music/control/next' topic."""
-    player_control(bus, active_service_name, "Next")
+    await player_control(proxies, active_service_name, "Next")
 
-def handle_previous_track(bus, active_service_name, payload):
+async def handle_previous_track(proxies, active_service_name, payload):
     """Handler for the 'music/control/previous' topic."""
-    player_control(bus, active_service_name, "Previous")
+    await player_control(proxies, active_service_name, "Previous")
 
-def handle_volume(bus, active_service_name, payload):
+async def handle_volume(proxies, active_service_name, payload):
     """Handler for the 'music/control/volume' topic."""
     try:
         volume_level = float(payload.decode())
         if not (0 <= volume_level <= 100):
             raise ValueError("Volume must be between 0 and 100")
-        
-        player_short_name = active_service_name.replace('org.mpris.MediaPlayer2.', '')
-        try:
-            proxy = bus.get(active_service_name, '/org/mpris/MediaPlayer2')
-            player_interface = proxy['org.mpris.MediaPlayer2.Player']
-            player_interface.Volume = volume_level / 100.0
-            logging.info(f"Set volume of {player_short_name} to {volume_level:.2f}.")
-        except Exception as e:
-            logging.error(f"Failed to set volume for {player_short_name}: {e}")
     except (ValueError, TypeError) as e:
-        logging.error(f"Invalid volume value received ('{payload.decode()}'): {e}")
+        raise CommandError(f"Invalid volume value received ('{payload.decode()}'): {e}") from e
+
+    player_short_name = active_service_name.replace('org.mpris.MediaPlayer2.', '')
+    try:
+        player = await proxies.get(active_service_name)
+        await player.set('Volume', 'd', volume_level / 100.0)
+        player.volume = volume_level / 100.0
+        logging.info(f"Set volume of {player_short_name} to {volume_level:.2f}.")
+    except Exception as e:
+        raise CommandError(f"Failed to set volume for {player_short_name}: {e}") from e
+
+async def handle_volume_step(proxies, active_service_name, payload):
+    """Handler for the 'music/control/volume/step' topic (delta in percent, e.g. '+5' or '-5')."""
+    try:
+        step = float(payload.decode())
+        if not math.isfinite(step):
+            raise ValueError("Step must be a finite number")
+    except (ValueError, TypeError) as e:
+        raise CommandError(f"Invalid volume step received ('{payload.decode()}'): {e}") from e
+
+    player_short_name = active_service_name.replace('org.mpris.MediaPlayer2.', '')
+    try:
+        player = await proxies.get(active_service_name)
+        current = player.volume
+        if current is None:
+            # Only needed until the first refresh has seen this player
+            current = await player.get('Volume')
+        new_volume = min(1.0, max(0.0, current + step / 100.0))
+        await player.set('Volume', 'd', new_volume)
+        player.volume = new_volume
+        logging.info(f"Stepped volume of {player_short_name} by {step:+.2f} to {new_volume * 100:.2f}.")
+    except Exception as e:
+        raise CommandError(f"Failed to step volume for {player_short_name}: {e}") from e
+
+async def handle_seek(proxies, active_service_name, payload):
+    """Handler for the 'music/control/position/seek' topic (offset in seconds, may be negative)."""
+    try:
+        offset_microseconds = int(float(payload.decode()) * 1_000_000)
+    except (ValueError, TypeError, OverflowError) as e:
+        raise CommandError(f"Invalid seek offset received ('{payload.decode()}'): {e}") from e
+
+    player_short_name = active_service_name.replace('org.mpris.MediaPlayer2.', '')
+    try:
+        player = await proxies.get(active_service_name)
+        await player.method('Seek', 'x', [offset_microseconds])
+        logging.info(f"Seeked {player_short_name} by {offset_microseconds / 1000000:+.2f}s.")
+    except Exception as e:
+        raise CommandError(f"Failed to seek {player_short_name}: {e}") from e
+
+# Every handler topic also exists per player as CONTROL_TOPIC_PREFIX<player>/<command>
+CONTROL_TOPIC_PREFIX = "music/control/"
 
 # --- A dictionary mapping topics to their handler functions ---
 TOPIC_HANDLERS = {
     "music/control/position": handle_set_position,
+    "music/control/position/seek": handle_seek,
     "music/control/playpause": handle_play_pause,
     "music/control/next": handle_next_track,
     "music/control/previous": handle_previous_track,
-    "music/control/volume": handle_volume
+    "music/control/volume": handle_volume,
+    "music/control/volume/step": handle_volume_step
 }
 
-def get_player_info(bus, service_name):
+async def set_player_position(proxies, service_name, position_microseconds):
     player_short_name = service_name.replace('org.mpris.MediaPlayer2.', '')
+
     try:
-        proxy = bus.get(service_name, '/org/mpris/MediaPlayer2')
-        props = proxy['org.mpris.MediaPlayer2.Player']
-        status = props.PlaybackStatus
-        meta = props.Metadata
+        player = await proxies.get(service_name) # Get the cached proxy for the player
+
+        metadata = await player.get('Metadata') # Read the Metadata property to get the current track ID
+        track_id = metadata.get('mpris:trackid')
+    except Exception as e:
+        # Catch errors like the player not running or D-Bus issues
+        raise CommandError(f"Failed to set position for {player_short_name}: {e}") from e
+
+    if not track_id or position_microseconds <= 1:
+        raise CommandError(f"SetPosition skipped for {player_short_name}: no trackid or position is too small.")
+
+    logging.info(f"Seeking {player_short_name} to {position_microseconds / 1000000:.2f}s in track {track_id}")
+    try:
+        await player.method('SetPosition', 'ox', [track_id, position_microseconds])
+    except Exception as e:
+        raise CommandError(f"Failed to set position for {player_short_name}: {e}") from e
+
+
+# --- Player state ---
+@dataclass
+class PlayerSnapshot:
+    """Typed view of one player's 'org.mpris.MediaPlayer2.Player' properties."""
+    service_name: str
+    status: str
+    title: str
+    artist: str
+    album_art_url: str
+    length: Optional[int]
+    elapsed: Optional[float]
+    track_id: Optional[str] = None
+    volume: Optional[float] = None
+    rate: float = 1.0
+    read_at: float = 0.0 # Epoch time at which the properties were read
+
+    @classmethod
+    def from_properties(cls, service_name, props):
+        """Builds a snapshot from the dict returned by Properties.GetAll."""
+        meta = props.get('Metadata', {})
         title = meta.get('xesam:title') or meta.get('xesam:url', 'Title not available')
         artists_raw = meta.get('xesam:artist', [])
         if not isinstance(artists_raw, list):
@@ -154,113 +503,1046 @@ def get_player_info(bus, service_name):
         artist_str = ', '.join(artist for artist in artists_raw if artist and artist.strip())
         if not artist_str:
             artist_str = meta.get('xesam:album') or 'Artist not available'
-        album_art_url = meta.get('mpris:artUrl', '')
         length = meta.get('mpris:length')
-        length = int(length) // 1000000 if length else None
-        try:
-            elapsed = int(props.Position) // 1000000 if hasattr(props, 'Position') else None
-        except Exception:
-            elapsed = None
+        # Position is optional in GetAll; some players omit it when nothing is loaded
+        position = props.get('Position')
+        return cls(
+            service_name=service_name,
+            status=props.get('PlaybackStatus', 'Stopped'),
+            title=title,
+            artist=artist_str,
+            album_art_url=meta.get('mpris:artUrl', ''),
+            length=int(length) // 1000000 if length else None,
+            elapsed=int(position) / 1_000_000 if position is not None else None,
+            track_id=meta.get('mpris:trackid'),
+            volume=props.get('Volume'),
+            rate=props.get('Rate', 1.0),
+            read_at=time.time(),
+        )
+
+    def to_payload(self):
+        """
+        Returns the JSON payload published on MQTT_TOPIC, without the position.
+        The position is added by the bridge as a PositionAnchor.
+        """
         return {
-            "service_name": service_name,
-            "status": status,
-            "title": title,
-            "artist": artist_str,
+            "status": self.status,
+            "title": self.title,
+            "artist": self.artist,
             "player": "Ubuntu PC",
-            "album_art_url": album_art_url,
-            "length": length,
-            "elapsed": elapsed
+            "album_art_url": self.album_art_url,
+            "length": self.length
         }
+
+@dataclass
+class PositionAnchor:
+    """
+    The playback position at a known wall-clock time. Consumers extrapolate the
+    current position as elapsed + (now - elapsed_timestamp) * rate, so the
+    status only has to be republished on play/pause/seek/track changes instead
+    of once per second.
+    """
+    elapsed: Optional[float]
+    timestamp: Optional[float]
+    rate: float # Effective rate: 0 unless the player is 'Playing'
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        rate = snapshot.rate if snapshot.status == 'Playing' else 0.0
+        return cls(elapsed=snapshot.elapsed, timestamp=snapshot.read_at, rate=rate)
+
+    def position_at(self, t):
+        if self.elapsed is None or self.timestamp is None:
+            return None
+        return self.elapsed + (t - self.timestamp) * self.rate
+
+    def is_consistent_with(self, other):
+        """True if other can be explained by extrapolating this anchor (no seek, no rate change)."""
+        if self.rate != other.rate:
+            return False
+        if self.elapsed is None or other.elapsed is None:
+            return self.elapsed is other.elapsed
+        expected = self.position_at(other.timestamp)
+        return abs(expected - other.elapsed) <= POSITION_DRIFT_TOLERANCE_SECONDS
+
+    def to_payload(self):
+        return {
+            "elapsed": round(self.elapsed, 3) if self.elapsed is not None else None,
+            "elapsed_timestamp": round(self.timestamp, 3) if self.elapsed is not None else None,
+            "rate": self.rate
+        }
+
+class PlayerArbiter:
+    """
+    Decides which player is the active one.
+
+    Players are ranked by status (Playing > Paused > Stopped) and, within the
+    same status, by their last activity: the last time they started playing
+    or changed status or track. That makes the choice independent of D-Bus
+    name order. After a switch, the active player is held for
+    ARBITRATION_HOLD_SECONDS, so rapid state churn results in at most one
+    published switch per hold window. The hold is skipped when the active
+    player disappears.
+    """
+
+    _STATUS_RANK = {'Playing': 2, 'Paused': 1, 'Stopped': 0}
+
+    def __init__(self, hold_seconds=ARBITRATION_HOLD_SECONDS):
+        self.hold_seconds = hold_seconds
+        self.active_service_name = None
+        self.switched_at = float('-inf')
+        self._last_activity = {} # service_name -> monotonic timestamp
+        self._last_seen = {}     # service_name -> (status, title)
+        # Seconds until a switch that was held back may happen, else None
+        self.recheck_in = None
+
+    def _update_activity(self, players, now):
+        for p in players:
+            state = (p.status, p.title)
+            previous = self._last_seen.get(p.service_name)
+            if previous is None:
+                # Players already playing when first seen count as active right now
+                self._last_activity[p.service_name] = now if p.status == 'Playing' else float('-inf')
+            elif previous != state:
+                self._last_activity[p.service_name] = now
+            self._last_seen[p.service_name] = state
+        present = {p.service_name for p in players}
+        for name in list(self._last_seen):
+            if name not in present:
+                self._last_seen.pop(name)
+                self._last_activity.pop(name, None)
+
+    def _rank(self, player):
+        return (
+            self._STATUS_RANK.get(player.status, -1),
+            self._last_activity.get(player.service_name, float('-inf')),
+            player.service_name,
+        )
+
+    def select(self, players, now=None):
+        """Returns the snapshot of the active player (or None) for this refresh."""
+        now = time.monotonic() if now is None else now
+        self.recheck_in = None
+        self._update_activity(players, now)
+        candidates = [p for p in players if p.status in self._STATUS_RANK]
+        if not candidates:
+            self.active_service_name = None
+            return None
+
+        best = max(candidates, key=self._rank)
+        current = next((p for p in candidates if p.service_name == self.active_service_name), None)
+        if current is None or best.service_name == current.service_name:
+            if current is None and best.service_name != self.active_service_name:
+                self.switched_at = now
+            self.active_service_name = best.service_name
+            return best
+
+        held_for = now - self.switched_at
+        if held_for < self.hold_seconds:
+            self.recheck_in = self.hold_seconds - held_for
+            return current
+
+        logging.info(f"Active player switched from {current.service_name} to {best.service_name}.")
+        self.active_service_name = best.service_name
+        self.switched_at = now
+        return best
+
+async def get_player_info(proxies, service_name):
+    """Reads all Player properties of one service in a single GetAll round trip."""
+    try:
+        player = await proxies.get(service_name)
+        props = await player.get_all()
+        snapshot = PlayerSnapshot.from_properties(service_name, props)
+        player.volume = snapshot.volume
+        return snapshot
     except Exception:
         return None
-    
-def set_player_position(bus, service_name, position_microseconds):
-    player_short_name = service_name.replace('org.mpris.MediaPlayer2.', '')
-    
-    try:
-        proxy = bus.get(service_name, '/org/mpris/MediaPlayer2') # Get a proxy object for the media player
 
-        player_interface = proxy['org.mpris.MediaPlayer2.Player'] # Get a proxy for the 'Player' interface
+async def get_players_info(proxies, service_names):
+    """
+    Batch variant of get_player_info: issues all GetAll calls concurrently so
+    the total time is that of the slowest player, not the sum. Players that
+    fail to answer are left out of the result.
+    """
+    players = await asyncio.gather(*(get_player_info(proxies, s) for s in service_names))
+    return [p for p in players if p]
+
 
-        metadata = player_interface.Metadata # Read the Metadata property to get the current track ID
-        track_id = metadata.get('mpris:trackid')
+# Published when no player is active
+IDLE_STATUS = {
+    "status": "Stopped", "title": "", "artist": "", "player": "Ubuntu PC",
+    "album_art_url": "", "length": None
+}
+
+# --- Bridge ---
+class PlayerProxyCache:
+    """
+    Keeps one ready-to-use MprisPlayer per MPRIS service so that status reads
+    and control commands don't have to resolve the service again on every
+    call. Players are keyed by the service's unique bus name (e.g. ':1.42')
+    and dropped when NameOwnerChanged reports that the owner went away or was
+    replaced.
+    """
+
+    def __init__(self, bus, bluez=None):
+        self.bus = bus
+        self.bluez = bluez # Optional BluezPlayers, whose players are controlled through it
+        self._owners = {}  # well-known name -> unique name
+        self._players = {} # unique name -> MprisPlayer
+
+    async def get(self, service_name):
+        """Returns the cached MprisPlayer for service_name, creating it on first use."""
+        if self.bluez and service_name in self.bluez:
+            return self.bluez.get(service_name)
+        owner = self._owners.get(service_name)
+        if owner is None:
+            body = await dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'GetNameOwner', 's', [service_name],
+                                   timeout=DBUS_CALL_TIMEOUT_SECONDS)
+            owner = body[0]
+            self._owners[service_name] = owner
+        player = self._players.get(owner)
+        if player is None:
+            player = MprisPlayer(self.bus, service_name, owner)
+            self._players[owner] = player
+        return player
+
+    def service_name_of(self, owner):
+        """Returns the service a signal sender (unique name) belongs to, or None if it was never resolved."""
+        player = self._players.get(owner)
+        return player.service_name if player else None
+
+    def next_probe_in(self):
+        """Seconds until the next quarantined player may be probed, or None if none is quarantined."""
+        retries = [p.breaker.retry_at for p in self._players.values() if p.breaker.quarantined]
+        if not retries:
+            return None
+        return max(0.0, min(retries) - time.monotonic())
 
-        if track_id and position_microseconds > 1:
-            print(f"Seeking {player_short_name} to {position_microseconds / 1000000:.2f}s in track {track_id}")
-            player_interface.SetPosition(track_id, position_microseconds)
+    def quarantined_count(self):
+        return sum(1 for p in self._players.values() if p.breaker.quarantined)
+
+    async def probe_due(self):
+        """Probes the quarantined players whose quarantine is over. Returns True if any of them answered."""
+        now = time.monotonic()
+        due = [p for p in self._players.values() if p.breaker.start_probe(now)]
+        answered = await asyncio.gather(*(p.probe() for p in due), return_exceptions=True)
+        return any(a is True for a in answered)
+
+    def owner_changed(self, service_name, old_owner, new_owner):
+        """Called from NameOwnerChanged; drops the proxy belonging to the old owner."""
+        if old_owner:
+            self._players.pop(old_owner, None)
+        stale_owner = self._owners.pop(service_name, None)
+        if stale_owner:
+            self._players.pop(stale_owner, None)
+        if new_owner:
+            self._owners[service_name] = new_owner
+
+@dataclass
+class ReplyTo:
+    """Where to send the outcome of a command (MQTT v5 request/response)."""
+    response_topic: str
+    correlation_data: Optional[bytes] = None
+
+def reply_target(message):
+    """Returns the ReplyTo of an MQTT v5 request, or None if no response was asked for."""
+    properties = message.properties
+    response_topic = getattr(properties, 'ResponseTopic', None) if properties else None
+    if not response_topic:
+        return None
+    return ReplyTo(response_topic, getattr(properties, 'CorrelationData', None))
+
+class CommandExecutor:
+    """
+    Runs control commands one at a time, off the MQTT receive path.
+
+    Commands on COALESCED_TOPICS are last-value-wins: while a command for the
+    same topic and player is still waiting, a newer payload replaces it instead
+    of queueing behind it, so the player always converges to the latest knob
+    value. Deltas on ACCUMULATED_TOPICS are summed into the waiting command
+    instead. Discrete commands (play/pause, next, previous) keep their order.
+    The queue is bounded; commands that don't fit are dropped and counted.
+
+    Every command may carry ReplyTo targets. Once it has run (or was dropped)
+    respond(reply_to, result) is called for each of them, including commands
+    that were merged into a later one. Replies are sent in the background, so
+    a slow broker never delays the next command.
+    """
+
+    def __init__(self, proxies, respond=None):
+        self.proxies = proxies
+        self.respond = respond
+        self._queue = asyncio.Queue(maxsize=COMMAND_QUEUE_SIZE)
+        # (topic, service_name) -> [payload, replies] of the waiting coalesced command
+        self._latest = {}
+
+        # --- Metrics ---
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.executed = 0
+
+    def submit(self, topic, handler, service_name, payload, reply_to=None):
+        """Queues a command without waiting for it to run."""
+        self.submitted += 1
+        COMMANDS.inc("submitted")
+        replies = [reply_to] if reply_to else []
+        merged = topic in COALESCED_TOPICS or topic in ACCUMULATED_TOPICS
+        key = (topic, service_name) if merged else None
+        if merged:
+            # Check the value now: an invalid one must not replace or poison the waiting command
+            try:
+                value = float(payload.decode())
+            except (ValueError, UnicodeDecodeError):
+                value = math.nan
+            if not math.isfinite(value):
+                self._drop(topic, replies, f"Dropped invalid value on '{topic}': '{payload.decode(errors='replace')}'")
+                return
+        if key is not None and key in self._latest:
+            waiting = self._latest[key]
+            if topic in ACCUMULATED_TOPICS:
+                payload = str(float(waiting[0]) + value).encode()
+            waiting[0] = payload
+            waiting[1].extend(replies)
+            self.coalesced += 1
+            COMMANDS.inc("coalesced")
+            return
+        try:
+            self._queue.put_nowait((topic, handler, service_name, key, payload, replies))
+        except asyncio.QueueFull:
+            self._drop(topic, replies, f"Command queue full, dropped '{topic}' ({self.dropped + 1} dropped so far).")
+            return
+        COMMAND_QUEUE_DEPTH.set(self.depth)
+        if key is not None:
+            self._latest[key] = [payload, replies]
+
+    def _drop(self, topic, replies, reason):
+        self.dropped += 1
+        COMMANDS.inc("dropped")
+        logging.warning(reason)
+        if replies:
+            result = {"topic": topic, "ok": False, "error": reason, "latency_ms": None}
+            asyncio.ensure_future(self.reply(replies, result))
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    async def run(self):
+        while True:
+            topic, handler, service_name, key, payload, replies = await self._queue.get()
+            COMMAND_QUEUE_DEPTH.set(self.depth)
+            if key is not None:
+                # Pick up whatever value (and requesters) arrived while this command was waiting
+                payload, replies = self._latest.pop(key)
+            error = None
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(handler(self.proxies, service_name, payload), COMMAND_TIMEOUT_SECONDS)
+            except CommandError as e:
+                error = str(e)
+                logging.error(error)
+            except asyncio.TimeoutError:
+                error = f"Handler for topic '{topic}' timed out after {COMMAND_TIMEOUT_SECONDS}s."
+                logging.error(error)
+            except Exception as e:
+                error = f"Error in handler for topic '{topic}': {e}"
+                logging.error(error, exc_info=True)
+            latency_ms = (time.monotonic() - started) * 1000
+            self.executed += 1
+            COMMANDS.inc("executed")
+            COMMAND_SECONDS.observe(latency_ms / 1000, topic)
+            if error is not None:
+                COMMAND_ERRORS.inc(topic)
+            if replies:
+                result = {"topic": topic, "ok": error is None, "error": error, "latency_ms": round(latency_ms, 3)}
+                # Waiting for the broker's acknowledgement would hold up the next command
+                asyncio.ensure_future(self.reply(replies, result))
+            self._queue.task_done()
+
+    async def wait_idle(self):
+        """Waits until every queued command has run."""
+        await self._queue.join()
+
+    async def reply(self, replies, result):
+        if not self.respond:
+            return
+        for reply_to in replies:
+            try:
+                await self.respond(reply_to, result)
+            except Exception as e:
+                logging.error(f"Failed to send command response to '{reply_to.response_topic}': {e}")
+
+class StatusAggregator:
+    """
+    Picks the globally active source out of the statuses that every bridge
+    publishes on HOST_STATUS_TOPIC/<CLIENT_ID>. Hosts are arbitrated with the
+    same PlayerArbiter rules as local players, so the canonical MQTT_TOPIC
+    changes once per real change instead of with every host that publishes.
+    """
+
+    def __init__(self):
+        self.hosts = {} # client id -> last status dict of that host
+        self.arbiter = PlayerArbiter()
+
+    def update(self, host, payload):
+        """Stores a host status; an empty payload (retained clear / last will) removes the host."""
+        if not payload:
+            if self.hosts.pop(host, None) is not None:
+                logging.info(f"Host '{host}' went away.")
+            return
+        try:
+            self.hosts[host] = json.loads(payload)
+        except json.JSONDecodeError:
+            logging.warning(f"Ignoring invalid status from host '{host}'.")
+
+    def select(self):
+        """Returns the status dict of the active host, or None if there is none."""
+        snapshots = [
+            PlayerSnapshot(
+                service_name=host, status=data.get("status", "Stopped"), title=data.get("title", ""),
+                artist=data.get("artist", ""), album_art_url=data.get("album_art_url", ""),
+                length=data.get("length"), elapsed=data.get("elapsed")
+            )
+            for host, data in self.hosts.items()
+        ]
+        chosen = self.arbiter.select(snapshots)
+        return self.hosts[chosen.service_name] if chosen else None
+
+class MprisBridge:
+    """
+    Watches MPRIS players through D-Bus signals and publishes the status of
+    the active player to MQTT. Nothing is polled at a high rate: a refresh only
+    runs when a player emits PropertiesChanged/Seeked, when a player appears or
+    disappears on the bus, or when the slow safety-net poll fires.
+
+    All state lives on the asyncio event loop; signal handling, refreshes and
+    command execution are coroutines, so no locking is needed.
+    """
+
+    def __init__(self, bus, proxies, mqttc, artwork=None, events=None, bluez=None):
+        self.bus = bus
+        self.proxies = proxies
+        self.mqttc = mqttc
+        self.artwork = artwork
+        self.events = events # Optional EventStream that gets every status, players and next track update
+        self.bluez = bluez # Optional BluezPlayers; its players take part in arbitration like MPRIS ones
+        self.executor = CommandExecutor(proxies, self.send_command_response)
+        self.arbiter = PlayerArbiter()
+        self.aggregator = StatusAggregator() if AGGREGATOR_ENABLED else None
+
+        # --- State Management ---
+        self.services = set()
+        self._name_changes = None # name -> present, for NameOwnerChanged seen while ListNames is in flight
+        self.active_service_name = None
+        self.last_published_json = ""
+        self.last_published_fields = {} # field -> payload last published on MQTT_TOPIC/<field>
+        self.last_published_binary = b""
+        self.last_status_json = "" # Published payload without the position anchor
+        self.anchor = None
+        self._seeked = set() # Services that emitted Seeked since the last status publish
+        self._refresh_event = asyncio.Event()
+        self._refreshed = asyncio.Event() # Set while no refresh is scheduled or running
+        self._snapshots = {} # service name -> PlayerSnapshot of its last read
+        self._stale = set() # Services to read again on the next refresh
+        self._read_all = True # Whether the next refresh reads every player
+        self._recheck_handle = None
+        self._probe_handle = None
+        self.last_players_json = ""
+        self.last_host_json = "" # Last status published on HOST_STATUS_TOPIC/<CLIENT_ID>
+        self.canonical_host = None # Host named in the canonical MQTT_TOPIC (aggregation mode)
+        self._aggregate_handle = None
+        self._aggregate_event = asyncio.Event()
+        self.started = asyncio.Event() # Set once the initial status is published
+        self.last_next_json = ""
+        self._next_track_key = None # (service_name, track_id) the published next track belongs to
+        self._tracklist_changed = set() # Players whose TrackList changed since their next track was read
+        self._no_tracklist = set() # Players known not to implement the TrackList interface
+
+    async def run(self):
+        """Starts the bridge and runs until one of its tasks fails."""
+        await self.start()
+        await asyncio.gather(
+            self._refresh_worker(),
+            self._safety_poll(),
+            self._command_loop(),
+            self.executor.run(),
+            self._aggregate_worker(),
+        )
+
+    async def start(self):
+        """Subscribes to the relevant signals and publishes the initial status."""
+        self.bus.add_message_handler(self._on_dbus_message)
+        topics = list(TOPIC_HANDLERS)
+        # The same commands addressed to a named player: music/control/<player>/<command>
+        topics += [f"{CONTROL_TOPIC_PREFIX}+/{topic[len(CONTROL_TOPIC_PREFIX):]}" for topic in TOPIC_HANDLERS]
+        if AGGREGATION_ENABLED:
+            topics.append(MQTT_TOPIC)
+        if self.aggregator:
+            topics.append(f"{HOST_STATUS_TOPIC}/+")
+        if self.bluez:
+            # Bluetooth players push their changes; a refresh reads them from the mirror
+            self.bluez.on_change = self.schedule_update
+        # All round trips at once. The bus daemon handles one connection's messages in order,
+        # so the match rules are in place before ListNames is answered and no player is missed.
+        await asyncio.gather(
+            *(dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'AddMatch', 's', [rule],
+                        timeout=DBUS_CALL_TIMEOUT_SECONDS) for rule in SIGNAL_MATCH_RULES),
+            self.mqttc.subscribe([(topic, 1) for topic in topics]),
+            self.start_bluez(),
+            self.sync_services(),
+        )
+        logging.info(f"Found {len(self.services)} MPRIS player(s) on startup.")
+        await self.refresh()
+        if not self._refresh_event.is_set():
+            self._refreshed.set()
+        self.started.set()
+
+    async def start_bluez(self):
+        if not self.bluez:
+            return
+        try:
+            await self.bluez.start()
+        except Exception as e:
+            logging.error(f"Failed to watch Bluetooth players: {e}")
+
+    async def list_services(self):
+        body = await dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'ListNames',
+                               timeout=DBUS_CALL_TIMEOUT_SECONDS)
+        return {s for s in body[0] if s.startswith(MPRIS_BASE)}
+
+    async def sync_services(self):
+        """
+        Replaces self.services with the players the bus daemon lists. Players that
+        appear or vanish while the call is in flight (or while start() waits for the
+        other round trips) are applied on top, so no signal is lost to the overwrite.
+        """
+        changes = self._name_changes = {}
+        try:
+            services = await self.list_services()
+        finally:
+            if self._name_changes is changes:
+                self._name_changes = None
+        for name, present in changes.items():
+            if present:
+                services.add(name)
+            else:
+                services.discard(name)
+        self.services = services
+
+    # --- Signal Handlers ---
+    def _on_dbus_message(self, message):
+        if message.message_type != MessageType.SIGNAL:
+            return
+        if message.member == 'NameOwnerChanged' and message.interface == DBUS_NAME:
+            self._on_name_owner_changed(*message.body)
+        elif message.member == 'PropertiesChanged' and message.path == MPRIS_PATH:
+            service_name = self.proxies.service_name_of(message.sender)
+            if service_name and message.body and message.body[0] == MPRIS_TRACKLIST_IFACE:
+                self._tracklist_changed.add(service_name)
+            self.schedule_refresh(service_name)
+        elif message.interface == MPRIS_TRACKLIST_IFACE and message.path == MPRIS_PATH:
+            # TrackListReplaced, TrackAdded, TrackRemoved, TrackMetadataChanged
+            service_name = self.proxies.service_name_of(message.sender)
+            if service_name:
+                self._tracklist_changed.add(service_name)
+            self.schedule_refresh(service_name)
+        elif message.member == 'Seeked' and message.path == MPRIS_PATH:
+            service_name = self.proxies.service_name_of(message.sender)
+            if service_name:
+                self._seeked.add(service_name)
+            self.schedule_refresh(service_name)
+
+    def _on_name_owner_changed(self, name, old_owner, new_owner):
+        if not name.startswith(MPRIS_BASE):
+            return
+        self.proxies.owner_changed(name, old_owner, new_owner)
+        self._no_tracklist.discard(name) # A restarted player may have gained a TrackList
+        if new_owner:
+            self._tracklist_changed.add(name) # ... or a different one
         else:
-            print(f"SetPosition skipped for {player_short_name}: no trackid or position is too small.")
-            
-    except Exception as e:
-        # Catch errors like the player not running or D-Bus issues
-        logging.error(f"Failed to set position for {player_short_name}: {e}")
+            self._tracklist_changed.discard(name)
+        if self._name_changes is not None:
+            self._name_changes[name] = bool(new_owner)
+        if new_owner:
+            logging.info(f"Player appeared: {name}")
+            self.services.add(name)
+        else:
+            logging.info(f"Player vanished: {name}")
+            self.services.discard(name)
+        self.schedule_refresh()
 
-def main_loop():
-    logging.info("Music checker service starting.")
-    mqttc = mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION2, client_id=CLIENT_ID) # type: ignore
-    mqttc.on_message = on_message
-    mqttc.on_subscribe = on_subscribe
-    mqttc.on_unsubscribe = on_unsubscribe
-    mqttc.on_connect = on_connect
-    if MQTT_USERNAME and MQTT_PASSWORD:
-        mqttc.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+    # --- Background Tasks ---
+    async def _safety_poll(self):
+        while True:
+            await asyncio.sleep(SAFETY_POLL_INTERVAL_SECONDS)
+            # Re-sync the player list as well, in case a NameOwnerChanged was missed.
+            try:
+                await self.sync_services()
+            except Exception as e:
+                logging.error(f"Safety poll error: {e}")
+            self.schedule_refresh()
 
-    try:
-        bus = pydbus.SessionBus()
-        mpris_base = 'org.mpris.MediaPlayer2'
-    except Exception as e:
-        logging.error(f"D-Bus connection failed: {e}")
-        sys.exit(1)
+    async def _refresh_worker(self):
+        # Refreshes run one at a time, so there is never more than one
+        # GetAll fan-out in flight.
+        while True:
+            await self._refresh_event.wait()
+            # Coalesce bursts of signals (players often emit several at once) into one refresh.
+            await asyncio.sleep(SIGNAL_DEBOUNCE_SECONDS)
+            self._refresh_event.clear()
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self.refresh(), REFRESH_TIMEOUT_SECONDS)
+            except Exception as e:
+                logging.error(f"Refresh error: {e}", exc_info=True)
+                self._read_all = True # The players it was to read may not have been read
+            REFRESH_SECONDS.observe(time.monotonic() - started)
+            if not self._refresh_event.is_set():
+                self._refreshed.set()
 
-    shared_data = {'bus': bus, 'active_service_name': None}
-    mqttc.user_data_set(shared_data)
+    async def _command_loop(self):
+        async for message in self.mqttc.messages:
+            if message.topic.matches(f"{HOST_STATUS_TOPIC}/+"):
+                if self.aggregator:
+                    host = message.topic.value.rsplit('/', 1)[1]
+                    self.aggregator.update(host, message.payload)
+                    self.schedule_aggregate()
+            elif message.topic.matches(MQTT_TOPIC):
+                self._on_canonical_status(message.payload)
+            else:
+                self.on_message(message)
+
+    # --- Aggregation ---
+    def _on_canonical_status(self, payload):
+        if self.events and payload:
+            # Hosts other than the aggregator learn the canonical status only from the broker
+            self.events.publish("status", payload.decode('utf-8'))
+        previous_host = self.canonical_host
+        try:
+            self.canonical_host = json.loads(payload).get("host") if payload else None
+        except (json.JSONDecodeError, AttributeError):
+            self.canonical_host = None
+        if self.canonical_host == CLIENT_ID and previous_host != CLIENT_ID:
+            # This host just became the active one, so its next track is the one to show
+            self._next_track_key = None
+            self.schedule_update()
 
+    def schedule_aggregate(self):
+        self._aggregate_event.set()
+
+    async def _aggregate_worker(self):
+        # Publishing waits for the broker, so it runs here rather than in the MQTT receive loop.
+        # Host updates that arrive meanwhile are handled together by the next run.
+        if not self.aggregator:
+            return
+        while True:
+            await self._aggregate_event.wait()
+            self._aggregate_event.clear()
+            await self.aggregate()
+
+    async def aggregate(self):
+        """Publishes the status of the globally active host as the canonical status."""
+        payload_data = self.aggregator.select()
+        if self.aggregator.arbiter.recheck_in is not None:
+            if self._aggregate_handle:
+                self._aggregate_handle.cancel()
+            self._aggregate_handle = asyncio.get_running_loop().call_later(
+                self.aggregator.arbiter.recheck_in, self.schedule_aggregate)
+        if payload_data is None:
+            payload_data = {**IDLE_STATUS, **PositionAnchor(None, None, 0.0).to_payload(), "host": None}
+        try:
+            await self.publish_status(payload_data)
+        except Exception as e:
+            logging.error(f"Failed to publish aggregated status: {e}")
+
+    # --- Commands ---
+    def on_message(self, message):
+        """
+        Dispatches incoming MQTT messages to the command executor. Handlers run
+        there, so a burst of commands never holds up the MQTT receive loop.
+        """
+        topic = message.topic.value
+        logging.info(f"Received message on topic '{topic}'")
+        reply_to = reply_target(message)
+
+        # Look up the handler for the received topic
+        handler = TOPIC_HANDLERS.get(topic)
+        if not handler and topic.startswith(CONTROL_TOPIC_PREFIX):
+            self.on_player_message(topic, message.payload, reply_to)
+            return
+        if not handler:
+            logging.warning(f"No handler found for topic '{topic}'.")
+            self.reject(reply_to, topic, f"No handler found for topic '{topic}'.")
+            return
+        if AGGREGATION_ENABLED and self.canonical_host not in (None, CLIENT_ID):
+            # The active host's bridge executes and answers the command
+            logging.info(f"Command on topic '{topic}' left to active host '{self.canonical_host}'.")
+            return
+        if not self.active_service_name:
+            logging.warning(f"Command on topic '{topic}' ignored: no active player.")
+            self.reject(reply_to, topic, "No active player.")
+            return
+        # Bind the command to the player that is active right now
+        self.executor.submit(topic, handler, self.active_service_name, message.payload, reply_to)
+
+    def on_player_message(self, topic, payload, reply_to):
+        """Handles music/control/<player>/<command>, which bypasses the active player selection."""
+        player_short_name, _, command = topic[len(CONTROL_TOPIC_PREFIX):].partition('/')
+        command_topic = CONTROL_TOPIC_PREFIX + command
+        handler = TOPIC_HANDLERS.get(command_topic)
+        if not handler:
+            logging.warning(f"No handler found for topic '{topic}'.")
+            self.reject(reply_to, topic, f"No handler found for topic '{topic}'.")
+            return
+        service_name = f"{MPRIS_BASE}.{player_short_name}"
+        if service_name not in self.services and not (self.bluez and service_name in self.bluez):
+            # With several hosts the player may live on another one, whose bridge answers
+            if not AGGREGATION_ENABLED:
+                logging.warning(f"Command on topic '{topic}' ignored: unknown player '{player_short_name}'.")
+                self.reject(reply_to, topic, f"Unknown player '{player_short_name}'.")
+            return
+        self.executor.submit(command_topic, handler, service_name, payload, reply_to)
+
+    def reject(self, reply_to, topic, error):
+        if reply_to:
+            result = {"topic": topic, "ok": False, "error": error, "latency_ms": None}
+            asyncio.ensure_future(self.executor.reply([reply_to], result))
+
+    async def send_command_response(self, reply_to, result):
+        """Publishes a command outcome to the requester's MQTT v5 ResponseTopic."""
+        properties = Properties(PacketTypes.PUBLISH)
+        if reply_to.correlation_data is not None:
+            properties.CorrelationData = reply_to.correlation_data
+        # Response topics are chosen by the requesters, so they share one metric label
+        await self.publish(reply_to.response_topic, json.dumps(result), retain=False, properties=properties,
+                           metric_topic="<response>")
+
+    # --- Refresh & Publish ---
+    def schedule_refresh(self, service_name=None):
+        """Reads service_name again on the next refresh, or every player if it is None."""
+        if service_name is None:
+            self._read_all = True
+        else:
+            self._stale.add(service_name)
+        self.schedule_update()
+
+    def schedule_update(self):
+        """Arbitrates and publishes again without reading any player (e.g. for the hold-down recheck)."""
+        self._refreshed.clear()
+        self._refresh_event.set()
+
+    async def wait_refreshed(self):
+        """Waits until every change signalled so far has been read and published."""
+        await self._refreshed.wait()
+
+    def schedule_probe(self):
+        """Arms a timer for the next probe of a quarantined player, if there is one."""
+        QUARANTINED_PLAYERS.set(self.proxies.quarantined_count())
+        if self._probe_handle:
+            self._probe_handle.cancel()
+            self._probe_handle = None
+        probe_in = self.proxies.next_probe_in()
+        if probe_in is not None:
+            self._probe_handle = asyncio.get_running_loop().call_later(
+                probe_in, lambda: asyncio.ensure_future(self.probe_quarantined()))
+
+    async def probe_quarantined(self):
+        """
+        Probes quarantined players outside of refreshes, so a player that is
+        still silent never delays the status of the others. A player that
+        answers is read again by the next refresh.
+        """
+        if await self.proxies.probe_due():
+            self.schedule_refresh()
+        self.schedule_probe()
+
+    async def read_players(self):
+        """
+        Returns the snapshots of all players. Only the players that signalled a
+        change since the last refresh are read again; startup, NameOwnerChanged
+        and the safety poll read all of them.
+        """
+        read_all, self._read_all = self._read_all, False
+        stale, self._stale = self._stale, set()
+        names = self.services if read_all else self.services & stale
+        players = await get_players_info(self.proxies, sorted(names))
+        for name in names:
+            self._snapshots.pop(name, None) # Players that failed to answer are left out
+        self._snapshots.update((p.service_name, p) for p in players)
+        for name in self._snapshots.keys() - self.services:
+            self._snapshots.pop(name)
+        return [self._snapshots[name] for name in sorted(self._snapshots)]
+
+    async def refresh(self):
+        players = await self.read_players()
+        if self.bluez:
+            players += [PlayerSnapshot.from_properties(service_name, props)
+                        for service_name, props in sorted(self.bluez.players().items())]
+        active_player = self.arbiter.select(players)
+        if self.arbiter.recheck_in is not None:
+            # A switch is being held back; look again once the hold-down expires
+            if self._recheck_handle:
+                self._recheck_handle.cancel()
+            self._recheck_handle = asyncio.get_running_loop().call_later(
+                self.arbiter.recheck_in, self.schedule_update)
+        self.schedule_probe()
+
+        # The status goes out first: it is what the display waits for, above all right after startup
+        await self.publish_active(active_player)
+        await self.publish_players(players, active_player)
+        if NEXT_TRACK_ENABLED:
+            await self.publish_next_track(active_player)
+
+    async def publish_active(self, active_player):
+        """Publishes the status of the active player, unless it only advanced as predicted."""
+        # Commands are routed to the active player
+        if active_player:
+            self.active_service_name = active_player.service_name
+            status_data = active_player.to_payload()
+            if self.artwork:
+                status_data["album_art_url"] = await self.artwork.resolve(status_data["album_art_url"])
+            anchor = PositionAnchor.from_snapshot(active_player)
+        else:
+            self.active_service_name = None
+            status_data = dict(IDLE_STATUS)
+            anchor = PositionAnchor(elapsed=None, timestamp=None, rate=0.0)
+
+        status_json = json.dumps(status_data, ensure_ascii=False)
+
+        # Keep the previous anchor while the position just advances as predicted;
+        # only a status/track change, a rate change or a seek moves it.
+        # A seek of a background player doesn't concern the published status.
+        seeked = active_player is not None and active_player.service_name in self._seeked
+        self._seeked.clear()
+        if status_json == self.last_status_json and not seeked \
+                and self.anchor is not None and self.anchor.is_consistent_with(anchor):
+            return
+        self.anchor = anchor
+        self.last_status_json = status_json
+
+        payload_data = {**status_data, **anchor.to_payload()}
+        if AGGREGATION_ENABLED:
+            # The aggregator decides what goes to MQTT_TOPIC
+            await self.publish_host_status({**payload_data, "host": CLIENT_ID})
+        else:
+            await self.publish_status(payload_data)
+
+    async def publish(self, topic, payload, retain=True, properties=None, metric_topic=None, qos=1):
+        """Publishes (by default with QoS 1, waiting for the broker's acknowledgement)."""
+        started = time.monotonic()
+        try:
+            await self.mqttc.publish(topic, payload, qos=qos, retain=retain, properties=properties,
+                                     timeout=MQTT_PUBLISH_TIMEOUT_SECONDS)
+        finally:
+            MQTT_PUBLISH_SECONDS.observe(time.monotonic() - started, metric_topic or topic)
+
+    async def publish_players(self, players, active_player):
+        """Publishes the retained list of players that can be addressed on the per-player control topics."""
+        players_data = [{
+            "name": player.service_name.replace('org.mpris.MediaPlayer2.', ''),
+            "status": player.status,
+            "active": player is active_player,
+        } for player in players]
+        players_json = json.dumps(players_data, ensure_ascii=False)
+        if players_json == self.last_players_json:
+            return
+        if self.events:
+            self.events.publish("players", players_json)
+        topic = f"{PLAYERS_TOPIC}/{CLIENT_ID}" if AGGREGATION_ENABLED else PLAYERS_TOPIC
+        await self.publish(topic, players_json)
+        logging.info(f"Players update: {players_json}")
+        self.last_players_json = players_json
+
+    async def read_next_track(self, active_player):
+        """Returns the metadata of the track after the current one, or None if it is not known."""
+        service_name = active_player.service_name
+        if service_name in self._no_tracklist or not active_player.track_id:
+            return None
+        player = await self.proxies.get(service_name)
+        try:
+            tracks = await player.tracks()
+        except DBusError as e:
+            if e.type not in NO_TRACKLIST_ERRORS:
+                raise # e.g. a player that is busy; ask again on the next change
+            self._no_tracklist.add(service_name)
+            return None
+        try:
+            next_index = tracks.index(active_player.track_id) + 1
+        except ValueError:
+            return None
+        if next_index >= len(tracks):
+            return None
+        metadata = await player.tracks_metadata([tracks[next_index]])
+        return metadata[0] if metadata else None
+
+    async def publish_next_track(self, active_player):
+        """Publishes the upcoming track of the active player, retained, on NEXT_TRACK_TOPIC."""
+        key = (active_player.service_name, active_player.track_id) if active_player else None
+        changed = active_player is not None and active_player.service_name in self._tracklist_changed
+        if key == self._next_track_key and not changed:
+            return
+        if AGGREGATION_ENABLED and self.canonical_host not in (None, CLIENT_ID):
+            return # The active host publishes its own next track
+        if active_player:
+            self._tracklist_changed.discard(active_player.service_name)
+        try:
+            metadata = await self.read_next_track(active_player) if active_player else None
+        except Exception as e:
+            logging.warning(f"Failed to read the track list of {active_player.service_name}: {e}")
+            return
+        self._next_track_key = key
+
+        next_data = {"title": "", "artist": "", "album_art_url": "", "length": None}
+        if metadata:
+            track = PlayerSnapshot.from_properties(active_player.service_name, {"Metadata": metadata})
+            next_data = {"title": track.title, "artist": track.artist,
+                         "album_art_url": track.album_art_url, "length": track.length}
+            if self.artwork:
+                next_data["album_art_url"] = await self.artwork.resolve(next_data["album_art_url"])
+        next_json = json.dumps(next_data, ensure_ascii=False)
+        if next_json != self.last_next_json:
+            if self.events:
+                self.events.publish("next", next_json)
+            await self.publish(NEXT_TRACK_TOPIC, next_json)
+            logging.info(f"Next track update: {next_json}")
+            self.last_next_json = next_json
+
+    async def publish_host_status(self, payload_data):
+        """Publishes this host's status as JSON on HOST_STATUS_TOPIC/<CLIENT_ID>."""
+        payload_json = json.dumps(payload_data, ensure_ascii=False)
+        if payload_json != self.last_host_json:
+            await self.publish(f"{HOST_STATUS_TOPIC}/{CLIENT_ID}", payload_json)
+            logging.info(f"Host status update: {payload_json}")
+            self.last_host_json = payload_json
+
+    async def publish_status(self, payload_data):
+        """Publishes the canonical status in every format enabled in the configuration."""
+        if self.events:
+            # Before the publishes, so local clients don't wait for the broker's acknowledgements
+            self.events.publish("status", json.dumps(payload_data, ensure_ascii=False))
+        # With aggregation, the other hosts learn the active host from the document on MQTT_TOPIC
+        if STATUS_PUBLISH_MODE in ("aggregate", "both") or AGGREGATION_ENABLED:
+            await self.publish_aggregate(payload_data)
+        if STATUS_PUBLISH_MODE in ("fields", "both"):
+            await self.publish_fields(payload_data)
+        if BINARY_STATUS_ENABLED:
+            await self.publish_binary(payload_data)
+
+    async def publish_aggregate(self, payload_data):
+        """Publishes the whole status document as JSON on MQTT_TOPIC."""
+        payload_json = json.dumps(payload_data, ensure_ascii=False)
+
+        if payload_json != self.last_published_json:
+            await self.publish(MQTT_TOPIC, payload_json)
+            logging.info(f"Status update: {payload_json}")
+            self.last_published_json = payload_json
+
+    async def publish_binary(self, payload_data):
+        """Publishes the status in the binary layout from status_codec.py on BINARY_STATUS_TOPIC."""
+        payload = encode_status(payload_data)
+        if payload != self.last_published_binary:
+            await self.publish(BINARY_STATUS_TOPIC, payload)
+            self.last_published_binary = payload
+
+    async def publish_fields(self, payload_data):
+        """
+        Publishes only the fields that changed, each as plain text on its own
+        retained MQTT_TOPIC/<field> topic. None is sent as an empty payload.
+        """
+        changed = {}
+        for field, value in payload_data.items():
+            payload = "" if value is None else str(value)
+            if self.last_published_fields.get(field) != payload:
+                changed[field] = payload
+        # The fields are independent, so wait for all PUBACKs at once
+        await asyncio.gather(*(
+            self.publish(f"{MQTT_TOPIC}/{field}", payload)
+            for field, payload in changed.items()
+        ))
+        self.last_published_fields.update(changed)
+        if changed:
+            logging.info(f"Field update: {', '.join(changed)}")
+
+def make_mqtt_client():
+    """Creates the MQTT client with a persistent session, so commands sent while offline are kept."""
+    # Clear this host's retained status if the bridge dies, so the aggregator drops it
+    will = aiomqtt.Will(f"{HOST_STATUS_TOPIC}/{CLIENT_ID}", "", qos=1, retain=True) if AGGREGATION_ENABLED else None
+    if MQTT_V5_ENABLED:
+        properties = Properties(PacketTypes.CONNECT)
+        properties.SessionExpiryInterval = MQTT_SESSION_EXPIRY_SECONDS
+        session = {"protocol": aiomqtt.ProtocolVersion.V5, "clean_start": False, "properties": properties}
+    else:
+        session = {"protocol": aiomqtt.ProtocolVersion.V311, "clean_session": False}
+    return aiomqtt.Client(
+        MQTT_BROKER_HOST, MQTT_BROKER_PORT, identifier=CLIENT_ID, keepalive=60,
+        username=MQTT_USERNAME or None, password=MQTT_PASSWORD or None, will=will, **session
+    )
+
+async def notify_ready(bridge, mqttc):
+    """Reports readiness to systemd once the first snapshot is published (or queued for the broker)."""
+    await bridge.started.wait()
+    broker = "connected to MQTT broker" if mqttc.connected.is_set() else "waiting for MQTT broker"
+    sd_notify.notify("READY=1", f"STATUS=Watching {len(bridge.services)} player(s), {broker}")
+    logging.info(f"Ready: first status published, {broker}.")
+
+async def main_loop():
+    logging.info("Music checker service starting.")
+    # The bridge keeps running while the broker is unreachable; the transport reconnects.
+    # It starts connecting right away, so the broker handshake overlaps the D-Bus setup below.
+    mqttc = MqttTransport(make_mqtt_client, MQTT_OUTBOX_SIZE, MQTT_RECONNECT_MIN_SECONDS,
+                          MQTT_RECONNECT_MAX_SECONDS, MQTT_PUBLISH_TIMEOUT_SECONDS)
+    mqtt_task = asyncio.ensure_future(mqttc.run())
     try:
-        mqttc.connect(MQTT_BROKER_HOST, MQTT_BROKER_PORT, 60)
+        bus = await MessageBus(bus_type=BusType.SESSION).connect()
     except Exception as e:
-        logging.error(f"MQTT connection failed: {e}")
+        logging.error(f"D-Bus connection failed: {e}")
         sys.exit(1)
 
-    mqttc.loop_start()
+    artwork = None
+    http_server = HttpServer(HTTP_HOST, HTTP_PORT)
+    if LOCAL_ARTWORK_ENABLED:
+        from artwork import ARTWORK_ROUTE, ArtworkCache
+        artwork = ArtworkCache(ARTWORK_CACHE_DIR, ARTWORK_SIZE, f"http://{HTTP_HOST_IP}:{HTTP_PORT}")
+        http_server.route(ARTWORK_ROUTE, artwork.handle_request)
+    if METRICS_ENABLED:
+        http_server.route(METRICS_ROUTE, METRICS.handle_request)
+    events = None
+    if EVENT_STREAM_ENABLED:
+        events = EventStream(EVENT_STREAM_REPLAY_SIZE)
+        http_server.route(EVENTS_ROUTE, events.handle_request)
+    if LOCAL_ARTWORK_ENABLED or METRICS_ENABLED or EVENT_STREAM_ENABLED:
+        await http_server.start()
 
-    last_published_json = ""
-    while True:
+    bluez = None
+    if BLUEZ_ENABLED:
         try:
-            services = [s for s in bus.get('.DBus').ListNames() if s.startswith(mpris_base)]
-            players = [get_player_info(bus, s) for s in services]
-            players = [p for p in players if p]
-            # Priority: Playing > Paused > Stopped
-            active_player = next((p for p in players if p['status'] == 'Playing'), None) \
-                or next((p for p in players if p['status'] == 'Paused'), None) \
-                or next((p for p in players if p['status'] == 'Stopped'), None)
-
-            # Update the shared active_service_name for the on_message callback
-            if active_player:
-                shared_data['active_service_name'] = active_player['service_name']
-                # Create a copy for JSON to avoid sending the service_name
-                payload_data = active_player.copy()
-                del payload_data['service_name']
-            else:
-                shared_data['active_service_name'] = None
-                payload_data = {
-                    "status": "Stopped", "title": "", "artist": "", "player": "Ubuntu PC",
-                    "album_art_url": "", "length": None, "elapsed": None
-                }
+            bluez = BluezPlayers(await MessageBus(bus_type=BusType.SYSTEM).connect(), DBUS_CALL_TIMEOUT_SECONDS)
+        except Exception as e:
+            logging.error(f"System bus connection failed, Bluetooth players disabled: {e}")
 
-            payload_json = json.dumps(payload_data, ensure_ascii=False)
+    bridge = MprisBridge(bus, PlayerProxyCache(bus, bluez), mqttc, artwork, events, bluez)
+    tasks = [mqtt_task, bridge.run(), notify_ready(bridge, mqttc), sd_notify.watchdog()]
+    if SPECTRUM_ENABLED:
+        from spectrum import SpectrumAnalyzer
 
-            if payload_json != last_published_json:
-                mqttc.publish(MQTT_TOPIC, payload_json, qos=1, retain=True)
-                logging.info(f"Status update: {payload_json}")
-                last_published_json = payload_json
+        async def publish_frame(frame):
+            # A late frame is worthless, so frames are fire-and-forget and not even attempted while
+            # offline (the transport would log every one it drops)
+            if mqttc.connected.is_set():
+                await bridge.publish(SPECTRUM_TOPIC, frame, retain=False, qos=0)
 
-            time.sleep(CHECK_INTERVAL_SECONDS)
-        except Exception as e:
-            logging.error(f"Main loop error: {e}", exc_info=True)
-            time.sleep(10)
+        analyzer = SpectrumAnalyzer(publish_frame, SPECTRUM_CAPTURE_COMMAND, SPECTRUM_SAMPLE_RATE,
+                                    SPECTRUM_FPS, SPECTRUM_BANDS)
+        tasks.append(analyzer.run())
+    if TELEMETRY_ENABLED:
+        telemetry = HostTelemetry(lambda payload: bridge.publish(f"{TELEMETRY_TOPIC}/{CLIENT_ID}", payload),
+                                  TELEMETRY_MIN_INTERVAL_SECONDS, TELEMETRY_MAX_INTERVAL_SECONDS)
+        tasks.append(telemetry.run())
+    await asyncio.gather(*tasks)
 
 if __name__ == '__main__':
     try:
-        main_loop()
+        asyncio.run(main_loop())
     except KeyboardInterrupt:
         logging.info("Service terminated by user.")
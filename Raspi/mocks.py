@@ -0,0 +1,310 @@
+# mocks.py
+
+"""
+Stand-ins for the bridge's surroundings, shared by replay.py and the
+benchmarks: a private dbus-daemon, scriptable MPRIS players to put on it, and
+an in-process replacement for the aiomqtt client. With these the bridge runs
+unmodified, without a desktop session or an MQTT broker.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import aiomqtt
+from dbus_next import PropertyAccess, Variant
+from dbus_next.aio import MessageBus
+from dbus_next.service import ServiceInterface, dbus_property, method, signal
+
+MPRIS_BASE = 'org.mpris.MediaPlayer2'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+MPRIS_TRACKLIST_IFACE = 'org.mpris.MediaPlayer2.TrackList'
+
+# D-Bus types of the well-known metadata keys; anything else is guessed from the Python value
+METADATA_SIGNATURES = {
+    "mpris:trackid": "o",
+    "mpris:length": "x",
+    "mpris:artUrl": "s",
+    "xesam:title": "s",
+    "xesam:album": "s",
+    "xesam:artist": "as",
+    "xesam:albumArtist": "as",
+    "xesam:url": "s",
+}
+
+
+def _guess_signature(value):
+    if isinstance(value, bool):
+        return "b"
+    if isinstance(value, int):
+        return "x"
+    if isinstance(value, float):
+        return "d"
+    if isinstance(value, list):
+        return "as"
+    return "s"
+
+
+def to_metadata(metadata):
+    """Turns plain recorded metadata back into the a{sv} dict a player sends."""
+    return {
+        key: Variant(METADATA_SIGNATURES.get(key) or _guess_signature(value), value)
+        for key, value in (metadata or {}).items()
+    }
+
+
+class PrivateBus:
+    """A dbus-daemon of its own, so mock players never touch the desktop session."""
+
+    def __init__(self):
+        self.address = None
+        self._process = None
+        self._dir = None
+
+    async def start(self):
+        if not shutil.which('dbus-daemon'):
+            raise RuntimeError("dbus-daemon is not installed")
+        self._dir = tempfile.mkdtemp(prefix='mpris-bridge-')
+        self._process = await asyncio.create_subprocess_exec(
+            'dbus-daemon', '--session', '--nofork', '--print-address=1',
+            f'--address=unix:path={os.path.join(self._dir, "bus")}',
+            stdout=asyncio.subprocess.PIPE,
+        )
+        self.address = (await self._process.stdout.readline()).decode().strip()
+        return self.address
+
+    async def stop(self):
+        if self._process and self._process.returncode is None:
+            self._process.terminate()
+            await self._process.wait()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+
+class MockPlayer(ServiceInterface):
+    """
+    An 'org.mpris.MediaPlayer2.Player' whose state is set from outside with
+    apply() and seeked(), emitting the same signals a real player would. The
+    control methods change the state like a real player, so commands sent by
+    the bridge have a visible effect.
+    """
+
+    def __init__(self, name, properties=None):
+        super().__init__('org.mpris.MediaPlayer2.Player')
+        self.player_name = name
+        self.bus = None
+        self.status = "Stopped"
+        self.metadata = {}
+        self.volume = 1.0
+        self.rate = 1.0
+        # Position anchor: position in microseconds at monotonic time _position_at
+        self._position = 0
+        self._position_at = time.monotonic()
+        self.calls = 0 # Method calls and property writes received from the bridge
+        self.tracklist = MockTrackList(self)
+        if properties:
+            self.apply(properties, emit=False)
+
+    async def connect(self, address):
+        """Puts the player on the bus at address under org.mpris.MediaPlayer2.<name>."""
+        self.bus = await MessageBus(bus_address=address).connect()
+        self.bus.export(MPRIS_PATH, self)
+        self.bus.export(MPRIS_PATH, self.tracklist)
+        await self.bus.request_name(f"{MPRIS_BASE}.{self.player_name}")
+        return self
+
+    def disconnect(self):
+        if self.bus:
+            self.bus.disconnect()
+            self.bus = None
+
+    # --- Scripted state ---
+    @property
+    def position(self):
+        if self.status != "Playing":
+            return self._position
+        return self._position + int((time.monotonic() - self._position_at) * 1_000_000 * self.rate)
+
+    def _set_position(self, position):
+        self._position = max(0, int(position))
+        self._position_at = time.monotonic()
+
+    def apply(self, properties, emit=True):
+        """Sets plain property values (as unpacked from D-Bus) and emits PropertiesChanged."""
+        changed = {}
+        if "PlaybackStatus" in properties:
+            self._set_position(self.position) # Freeze or restart the anchor on status changes
+            self.status = changed["PlaybackStatus"] = properties["PlaybackStatus"]
+        if "Metadata" in properties:
+            self.metadata = changed["Metadata"] = to_metadata(properties["Metadata"])
+        if "Volume" in properties:
+            self.volume = changed["Volume"] = float(properties["Volume"])
+        if "Rate" in properties:
+            self._set_position(self.position)
+            self.rate = changed["Rate"] = float(properties["Rate"])
+        if "Position" in properties:
+            self._set_position(properties["Position"]) # Never signalled, only read
+        if emit and changed:
+            self.emit_properties_changed(changed)
+
+    def seeked(self, position):
+        self._set_position(position)
+        self.Seeked(self._position)
+
+    # --- Methods ---
+    @method()
+    def PlayPause(self):
+        self.calls += 1
+        self.apply({"PlaybackStatus": "Paused" if self.status == "Playing" else "Playing"})
+
+    @method()
+    def Play(self):
+        self.calls += 1
+        self.apply({"PlaybackStatus": "Playing"})
+
+    @method()
+    def Pause(self):
+        self.calls += 1
+        self.apply({"PlaybackStatus": "Paused"})
+
+    @method()
+    def Stop(self):
+        self.calls += 1
+        self.apply({"PlaybackStatus": "Stopped"})
+
+    @method()
+    def Next(self):
+        self.calls += 1
+
+    @method()
+    def Previous(self):
+        self.calls += 1
+
+    @method()
+    def Seek(self, offset: 'x'):
+        self.calls += 1
+        self.seeked(self.position + offset)
+
+    @method()
+    def SetPosition(self, track_id: 'o', position: 'x'):
+        self.calls += 1
+        self.seeked(position)
+
+    @signal()
+    def Seeked(self, position) -> 'x':
+        return position
+
+    # --- Properties ---
+    @dbus_property(access=PropertyAccess.READ)
+    def PlaybackStatus(self) -> 's':
+        return self.status
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Metadata(self) -> 'a{sv}':
+        return self.metadata
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Position(self) -> 'x':
+        return self.position
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Rate(self) -> 'd':
+        return self.rate
+
+    @dbus_property()
+    def Volume(self) -> 'd':
+        return self.volume
+
+    @Volume.setter
+    def Volume(self, volume: 'd'):
+        self.calls += 1
+        self.apply({"Volume": volume})
+
+
+class MockTrackList(ServiceInterface):
+    """
+    The 'org.mpris.MediaPlayer2.TrackList' of a MockPlayer. It only holds the
+    current track, so there is never a next one, but the bridge's track list
+    reads succeed as with most real players.
+    """
+
+    def __init__(self, player):
+        super().__init__(MPRIS_TRACKLIST_IFACE)
+        self.player = player
+
+    def _track_id(self):
+        track_id = self.player.metadata.get("mpris:trackid")
+        return track_id.value if track_id else None
+
+    @method()
+    def GetTracksMetadata(self, track_ids: 'ao') -> 'aa{sv}':
+        return [self.player.metadata for track_id in track_ids if track_id == self._track_id()]
+
+    @dbus_property(access=PropertyAccess.READ)
+    def Tracks(self) -> 'ao':
+        track_id = self._track_id()
+        return [track_id] if track_id else []
+
+    @dbus_property(access=PropertyAccess.READ)
+    def CanEditTracks(self) -> 'b':
+        return False
+
+
+class MqttStandIn:
+    """
+    Replaces aiomqtt.Client (or MqttTransport) for the bridge: publishes are
+    recorded instead of sent, and inject() delivers a message as if it came
+    from the broker, provided the bridge subscribed to its topic.
+    """
+
+    def __init__(self):
+        self.published = [] # (monotonic time, topic, payload, retain)
+        self.subscriptions = []
+        self.on_publish = None # Optional callback(topic, payload)
+        self.connected = asyncio.Event()
+        self.connected.set() # Always "connected", like an MqttTransport that never loses its broker
+        self._incoming = asyncio.Queue()
+        self.messages = self._iterate()
+
+    async def run(self):
+        await asyncio.Event().wait()
+
+    async def subscribe(self, topic, qos=0, **kwargs):
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        self.subscriptions += [t if isinstance(t, str) else t[0] for t in topics]
+
+    async def publish(self, topic, payload=None, qos=0, retain=False, properties=None, timeout=None):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self.published.append((time.monotonic(), topic, payload or b"", retain))
+        if self.on_publish:
+            self.on_publish(topic, payload)
+
+    def inject(self, topic, payload, properties=None):
+        """Delivers a message to the bridge. Returns False if nothing is subscribed to topic."""
+        message_topic = aiomqtt.Topic(topic)
+        if not any(message_topic.matches(s) for s in self.subscriptions):
+            return False
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self._incoming.put_nowait(aiomqtt.Message(topic, payload, 1, False, 0, properties))
+        return True
+
+    async def delivered(self):
+        """Waits until the bridge has handled every injected message."""
+        await self._incoming.join()
+
+    async def _iterate(self):
+        while True:
+            yield await self._incoming.get()
+            # The consumer only asks for the next message once it is done with this one
+            self._incoming.task_done()
@@ -0,0 +1,123 @@
+# mqtt_transport.py
+
+"""
+An MQTT connection that survives the broker going away.
+
+MqttTransport offers the subset of aiomqtt.Client the bridge uses
+(publish, subscribe and messages), but it stays usable while the broker is
+unreachable. It reconnects with exponential backoff. The client is expected
+to use a persistent session, so the broker keeps the subscriptions and
+queues QoS 1 commands while the bridge is away. Publishes made while offline
+go into a small outbox that holds only the latest payload per topic. After a
+reconnect the outbox is flushed, so a long outage costs one up-to-date status
+rather than a backlog. Topics whose latest payload is the one the broker
+already has are skipped.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+import aiomqtt
+
+
+class MqttTransport:
+    """Reconnecting, outbox-buffered stand-in for an aiomqtt.Client."""
+
+    def __init__(self, make_client, outbox_size=64, reconnect_min_seconds=1.0, reconnect_max_seconds=60.0,
+                 publish_timeout=None):
+        self.make_client = make_client # Returns a new, not yet connected aiomqtt.Client
+        self.outbox_size = outbox_size
+        self.reconnect_min_seconds = reconnect_min_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.publish_timeout = publish_timeout
+        self.client = None # Set while connected
+        self.connected = asyncio.Event()
+        self._subscriptions = {} # topic -> qos, renewed on every connect
+        self._outbox = OrderedDict() # topic -> (payload, qos, retain, properties)
+        self._delivered = {} # retained topic -> last payload acknowledged by the broker
+        self._incoming = asyncio.Queue()
+        self.messages = self._iterate()
+
+    # --- aiomqtt.Client interface ---
+    async def subscribe(self, topic, qos=0, **kwargs):
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        self._subscriptions.update((t, q) for t, q in topics)
+        if self.client:
+            try:
+                await self.client.subscribe(topics)
+            except aiomqtt.MqttError as e:
+                logging.warning(f"Subscribe failed, will retry after reconnecting: {e}")
+
+    async def publish(self, topic, payload=None, qos=0, retain=False, properties=None, timeout=None):
+        """Publishes now if connected, otherwise (or if that fails) keeps the message for the next connect."""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        if self.client:
+            try:
+                await self.client.publish(topic, payload, qos=qos, retain=retain, properties=properties,
+                                          timeout=timeout or self.publish_timeout)
+                self._outbox.pop(topic, None) # A newer payload supersedes anything still waiting
+                if retain:
+                    self._delivered[topic] = payload
+                return
+            except aiomqtt.MqttError as e:
+                logging.warning(f"Publish to '{topic}' failed, keeping it for the next connect: {e}")
+        self._enqueue(topic, payload, qos, retain, properties)
+
+    async def _iterate(self):
+        while True:
+            yield await self._incoming.get()
+
+    # --- Outbox ---
+    def _enqueue(self, topic, payload, qos, retain, properties):
+        if not retain:
+            # Non-retained messages (command responses) are only useful right away
+            logging.info(f"Offline, dropped non-retained message on '{topic}'.")
+            return
+        self._outbox.pop(topic, None)
+        self._outbox[topic] = (payload, qos, retain, properties)
+        while len(self._outbox) > self.outbox_size:
+            dropped, _ = self._outbox.popitem(last=False)
+            logging.warning(f"Outbox full, dropped pending message on '{dropped}'.")
+
+    async def _flush(self):
+        sent = skipped = 0
+        while self._outbox and self.client:
+            topic, (payload, qos, retain, properties) = next(iter(self._outbox.items()))
+            if self._delivered.get(topic) == payload:
+                skipped += 1 # The broker already retains exactly this
+            else:
+                await self.client.publish(topic, payload, qos=qos, retain=retain, properties=properties,
+                                          timeout=self.publish_timeout)
+                self._delivered[topic] = payload
+                sent += 1
+            # Only drop it once sent, so a failed flush is retried on the next connect
+            if self._outbox.get(topic, (None,))[0] == payload:
+                del self._outbox[topic]
+        if sent or skipped:
+            logging.info(f"Outbox flushed: {sent} sent, {skipped} already up to date.")
+
+    # --- Connection ---
+    async def run(self):
+        """Connects and reconnects forever, delivering incoming messages to self.messages."""
+        delay = self.reconnect_min_seconds
+        while True:
+            try:
+                async with self.make_client() as client:
+                    logging.info("Connected to MQTT broker.")
+                    delay = self.reconnect_min_seconds
+                    self.client = client
+                    self.connected.set()
+                    if self._subscriptions:
+                        await client.subscribe(list(self._subscriptions.items()))
+                    await self._flush()
+                    async for message in client.messages:
+                        self._incoming.put_nowait(message)
+            except aiomqtt.MqttError as e:
+                logging.error(f"MQTT connection lost or failed: {e}. Reconnecting in {delay:.0f}s.")
+            finally:
+                self.client = None
+                self.connected.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_seconds)
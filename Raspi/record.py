@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# record.py
+
+"""
+Records what the bridge sees on a real desktop: MPRIS signals, full property
+snapshots of every player and incoming MQTT control commands, each with its
+time offset, as one compact JSON object per line. replay.py plays such a
+recording back against mock players.
+
+    python3 record.py session.jsonl [duration_seconds]
+
+Event lines (t is seconds since the start of the recording):
+
+    {"t": 0.0, "type": "player", "name": "spotify", "props": {...}}   appeared, or initial snapshot
+    {"t": 1.2, "type": "changed", "name": "spotify", "props": {...}}  PropertiesChanged
+    {"t": 3.4, "type": "seeked", "name": "spotify", "position": 61000000}
+    {"t": 5.6, "type": "vanished", "name": "spotify"}
+    {"t": 7.8, "type": "command", "topic": "music/control/playpause", "payload": ""}
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+
+import aiomqtt
+from dbus_next import BusType, MessageType
+from dbus_next.aio import MessageBus
+
+from dbus_calls import DBUS_NAME, DBUS_PATH, PROPERTIES_IFACE, dbus_call, unpack_variants
+from main import (CLIENT_ID, CONTROL_TOPIC_PREFIX, MPRIS_BASE, MPRIS_PATH, MPRIS_PLAYER_IFACE, MQTT_BROKER_HOST,
+                  MQTT_BROKER_PORT, MQTT_PASSWORD, MQTT_USERNAME, SIGNAL_MATCH_RULES)
+
+RECORDING_VERSION = 1
+
+
+class Recorder:
+    def __init__(self, bus, output):
+        self.bus = bus
+        self.output = output
+        self.started = time.monotonic()
+        self.owners = {} # unique name -> player short name
+        self.events = 0
+
+    def write(self, event_type, **fields):
+        event = {"t": round(time.monotonic() - self.started, 6), "type": event_type, **fields}
+        self.output.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self.events += 1
+
+    async def start(self):
+        self.output.write(json.dumps({"type": "header", "version": RECORDING_VERSION, "started": time.time()}) + "\n")
+        self.bus.add_message_handler(self._on_dbus_message)
+        for rule in SIGNAL_MATCH_RULES:
+            await dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'AddMatch', 's', [rule])
+        names = (await dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'ListNames'))[0]
+        for service_name in sorted(n for n in names if n.startswith(MPRIS_BASE)):
+            owner = (await dbus_call(self.bus, DBUS_NAME, DBUS_PATH, DBUS_NAME, 'GetNameOwner', 's', [service_name]))[0]
+            await self.snapshot(service_name, owner)
+
+    async def snapshot(self, service_name, owner):
+        player_short_name = service_name.replace('org.mpris.MediaPlayer2.', '')
+        self.owners[owner] = player_short_name
+        try:
+            body = await dbus_call(self.bus, owner, MPRIS_PATH, PROPERTIES_IFACE, 'GetAll', 's', [MPRIS_PLAYER_IFACE])
+        except Exception as e:
+            logging.warning(f"Could not read {player_short_name}: {e}")
+            return
+        self.write("player", name=player_short_name, props=unpack_variants(body[0]))
+
+    def _on_dbus_message(self, message):
+        if message.message_type != MessageType.SIGNAL:
+            return
+        if message.member == 'NameOwnerChanged' and message.interface == DBUS_NAME:
+            name, old_owner, new_owner = message.body
+            if not name.startswith(MPRIS_BASE):
+                return
+            if new_owner:
+                asyncio.ensure_future(self.snapshot(name, new_owner))
+            else:
+                self.owners.pop(old_owner, None)
+                self.write("vanished", name=name.replace('org.mpris.MediaPlayer2.', ''))
+            return
+        player_short_name = self.owners.get(message.sender)
+        if player_short_name is None or message.path != MPRIS_PATH:
+            return
+        if message.member == 'PropertiesChanged':
+            _interface, changed, _invalidated = message.body
+            self.write("changed", name=player_short_name, props=unpack_variants(changed))
+        elif message.member == 'Seeked':
+            self.write("seeked", name=player_short_name, position=message.body[0])
+
+    def on_command(self, message):
+        self.write("command", topic=message.topic.value, payload=message.payload.decode('utf-8', errors='replace'))
+
+
+async def record(path, duration):
+    bus = await MessageBus(bus_type=BusType.SESSION).connect()
+    with open(path, 'w', encoding='utf-8') as output:
+        recorder = Recorder(bus, output)
+        await recorder.start()
+        logging.info(f"Recording to {path}" + (f" for {duration}s" if duration else ", stop with Ctrl+C"))
+        async with aiomqtt.Client(
+            MQTT_BROKER_HOST, MQTT_BROKER_PORT, identifier=f"{CLIENT_ID}_recorder",
+            username=MQTT_USERNAME or None, password=MQTT_PASSWORD or None
+        ) as mqttc:
+            await mqttc.subscribe(f"{CONTROL_TOPIC_PREFIX}#")
+
+            async def receive():
+                async for message in mqttc.messages:
+                    recorder.on_command(message)
+
+            try:
+                await asyncio.wait_for(receive(), duration)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                logging.info(f"Recorded {recorder.events} events.")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    try:
+        asyncio.run(record(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else None))
+    except KeyboardInterrupt:
+        pass
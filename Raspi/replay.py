@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# replay.py
+
+"""
+Plays a recording from record.py back against the unmodified bridge. Each
+recorded player becomes a MockPlayer on a private dbus-daemon, recorded
+commands are delivered through an in-process MQTT stand-in, and everything
+the bridge publishes is collected. No desktop session or broker is needed,
+so performance problems and regressions can be reproduced in CI.
+
+    python3 replay.py session.jsonl [--speed 10] [--output published.jsonl] [--expect published.jsonl]
+
+--speed scales the recorded timing (0 replays without any pauses). After
+a player appears or vanishes, and after a command, the replay waits for the
+bridge to catch up, so accelerated runs publish what the recording did. The
+summary lists publishes per topic and the D-Bus calls the bridge made;
+--output writes every published message as JSON lines for diffing two runs.
+--expect compares the publishes with those of an earlier --output and exits
+with status 1 if they differ, which makes a recording a regression test.
+Only what a subscriber would see is compared: the sequence of payloads per
+topic, without repeats and without the fields that depend on the wall clock.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+
+from dbus_next.aio import MessageBus
+
+import main
+from mocks import MockPlayer, MqttStandIn, PrivateBus
+
+SETTLE_SECONDS = 0.5 # Time the bridge gets to react to the last event
+SYNC_TIMEOUT_SECONDS = 2.0 # Upper bound for the bridge to notice a player appearing or vanishing
+# Status fields that depend on when the replay ran rather than on what happened in it
+VOLATILE_FIELDS = ("elapsed", "elapsed_timestamp")
+# Topics that carry those fields in a form that can't be stripped
+VOLATILE_TOPICS = {main.BINARY_STATUS_TOPIC} | {f"{main.MQTT_TOPIC}/{field}" for field in VOLATILE_FIELDS}
+
+
+def load_events(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if lines and lines[0].get("type") == "header":
+        lines = lines[1:]
+    return lines
+
+
+class Replayer:
+    def __init__(self, address, mqtt, bridge):
+        self.address = address
+        self.mqtt = mqtt
+        self.bridge = bridge
+        self.players = {} # short name -> MockPlayer
+        self.unrouted_commands = 0
+
+    async def apply(self, event):
+        event_type = event["type"]
+        if event_type == "player":
+            player = self.players.get(event["name"])
+            if player is None:
+                player = MockPlayer(event["name"], event["props"])
+                await player.connect(self.address)
+                self.players[event["name"]] = player
+                await self.sync(event["name"], present=True)
+            else:
+                player.apply(event["props"])
+        elif event_type == "changed":
+            if event["name"] in self.players:
+                self.players[event["name"]].apply(event["props"])
+        elif event_type == "seeked":
+            if event["name"] in self.players:
+                self.players[event["name"]].seeked(event["position"])
+        elif event_type == "vanished":
+            player = self.players.pop(event["name"], None)
+            if player:
+                player.disconnect()
+                await self.sync(event["name"], present=False)
+        elif event_type == "command":
+            if not self.mqtt.inject(event["topic"], event["payload"]):
+                self.unrouted_commands += 1
+            else:
+                await self.settle()
+        else:
+            logging.warning(f"Skipping unknown event type '{event_type}'")
+
+    async def sync(self, name, present):
+        """
+        Waits until the bridge has picked up a player appearing or vanishing, so that
+        accelerated replays send later commands to the same players as the
+        recording did.
+        """
+        deadline = time.monotonic() + SYNC_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            # The published player list is only updated once a refresh has picked up the change
+            players = json.loads(self.bridge.last_players_json or "[]")
+            if any(player["name"] == name for player in players) == present:
+                return
+            await asyncio.sleep(0.005)
+
+    async def settle(self):
+        """
+        Waits until the bridge has run the commands sent so far and published their
+        effect, so that accelerated replays don't change or remove a player before
+        a command reaches it.
+        """
+        try:
+            await asyncio.wait_for(self._settle(), SYNC_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logging.warning("The bridge did not finish the replayed commands in time.")
+
+    async def _settle(self):
+        await self.mqtt.delivered()
+        await self.bridge.executor.wait_idle()
+        await self.bridge.wait_refreshed()
+
+    def close(self):
+        for player in self.players.values():
+            player.disconnect()
+
+
+async def replay(events, speed):
+    """Replays events against the bridge. Returns the published messages in the --output format."""
+    async with PrivateBus() as private_bus:
+        mqtt = MqttStandIn()
+        bus = await MessageBus(bus_address=private_bus.address).connect()
+        bridge = main.MprisBridge(bus, main.PlayerProxyCache(bus), mqtt)
+        replayer = Replayer(private_bus.address, mqtt, bridge)
+        bridge_task = asyncio.ensure_future(bridge.run())
+        await asyncio.wait([bridge_task, asyncio.ensure_future(bridge.started.wait())],
+                           return_when=asyncio.FIRST_COMPLETED)
+
+        started = time.monotonic()
+        for event in events:
+            if speed > 0:
+                delay = event["t"] / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await replayer.apply(event)
+            if bridge_task.done():
+                break
+        await asyncio.sleep(SETTLE_SECONDS)
+        elapsed = time.monotonic() - started
+
+        bridge_task.cancel()
+        try:
+            await bridge_task
+        except asyncio.CancelledError:
+            pass
+        replayer.close()
+        bus.disconnect()
+
+    print_summary(events, mqtt, replayer, elapsed)
+    return [{
+        "t": round(at - started, 6), "topic": topic,
+        "payload": payload.decode('utf-8', errors='replace'), "retain": retain,
+    } for at, topic, payload, retain in mqtt.published]
+
+
+def write_published(path, published):
+    with open(path, 'w', encoding='utf-8') as f:
+        for message in published:
+            f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+
+def timeline(published):
+    """Returns {topic: [payload, ...]}: what a subscriber sees, minus repeats and volatile fields."""
+    topics = {}
+    for message in published:
+        if message["topic"] in VOLATILE_TOPICS:
+            continue
+        payload = message["payload"]
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            payload = json.dumps({k: v for k, v in data.items() if k not in VOLATILE_FIELDS}, ensure_ascii=False)
+        payloads = topics.setdefault(message["topic"], [])
+        if not payloads or payloads[-1] != payload:
+            payloads.append(payload)
+    return topics
+
+
+def compare(published, expected):
+    """Returns a list of differences between two runs' publishes; empty if they match."""
+    actual_topics, expected_topics = timeline(published), timeline(expected)
+    differences = []
+    for topic in sorted(actual_topics.keys() | expected_topics.keys()):
+        actual, wanted = actual_topics.get(topic, []), expected_topics.get(topic, [])
+        if actual == wanted:
+            continue
+        index = next((i for i, (a, w) in enumerate(zip(actual, wanted)) if a != w), min(len(actual), len(wanted)))
+        differences.append(
+            f"{topic}: {len(actual)} payload(s), expected {len(wanted)}; first difference at #{index}:\n"
+            f"    got      {actual[index] if index < len(actual) else '(nothing)'}\n"
+            f"    expected {wanted[index] if index < len(wanted) else '(nothing)'}")
+    return differences
+
+
+def print_summary(events, mqtt, replayer, elapsed):
+    print(f"Replayed {len(events)} events in {elapsed:.2f}s "
+          f"({sum(e['type'] == 'command' for e in events)} commands, {replayer.unrouted_commands} not subscribed)")
+    print(f"Published {len(mqtt.published)} messages:")
+    for topic, count in sorted(Counter(topic for _, topic, _, _ in mqtt.published).items()):
+        print(f"  {topic:<40} {count}")
+    calls = main.DBUS_CALL_SECONDS.counts()
+    print(f"D-Bus calls ({sum(calls.values())}):")
+    for (member, peer), count in sorted(calls.items()):
+        print(f"  {member:<20} {peer:<30} {count}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a record.py recording against the bridge.")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale; 0 replays without pauses")
+    parser.add_argument("--output", help="write all published messages to this JSON lines file")
+    parser.add_argument("--expect", help="fail unless the publishes match those in this --output file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        published = asyncio.run(replay(load_events(args.recording), args.speed))
+    except KeyboardInterrupt:
+        sys.exit(1)
+    if args.output:
+        write_published(args.output, published)
+    if args.expect:
+        differences = compare(published, load_events(args.expect))
+        for difference in differences:
+            print(difference)
+        print(f"{len(differences)} topic(s) differ from {args.expect}" if differences
+              else f"Publishes match {args.expect}")
+        sys.exit(1 if differences else 0)
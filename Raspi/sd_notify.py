@@ -0,0 +1,56 @@
+# sd_notify.py
+
+"""
+Readiness and watchdog notifications for systemd, without libsystemd.
+
+With Type=notify, systemd passes a datagram socket in $NOTIFY_SOCKET and
+waits for "READY=1" on it before it considers the service started. With
+WatchdogSec set, it also passes $WATCHDOG_USEC and restarts the service if
+no "WATCHDOG=1" arrives within that interval. Outside of systemd (no
+$NOTIFY_SOCKET) every function here does nothing.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+
+
+def notify(*states):
+    """Sends state lines such as "READY=1" or "STATUS=..." to systemd. Returns True if they were sent."""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:] # Abstract socket namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.connect(address)
+            sock.sendall('\n'.join(states).encode('utf-8'))
+    except OSError as e:
+        logging.warning(f"Failed to notify systemd: {e}")
+        return False
+    return True
+
+
+def watchdog_interval():
+    """Seconds between two watchdog pings (half the configured timeout), or None if the watchdog is off."""
+    usec = os.environ.get('WATCHDOG_USEC')
+    pid = os.environ.get('WATCHDOG_PID')
+    if not usec or (pid and int(pid) != os.getpid()):
+        return None
+    return int(usec) / 1_000_000 / 2
+
+
+async def watchdog():
+    """
+    Pings the systemd watchdog for as long as the event loop keeps running
+    coroutines, so a blocked loop gets the service restarted.
+    """
+    interval = watchdog_interval()
+    if interval is None:
+        return
+    logging.info(f"systemd watchdog enabled, pinging every {interval:.1f}s.")
+    while True:
+        notify("WATCHDOG=1")
+        await asyncio.sleep(interval)
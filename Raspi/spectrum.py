@@ -0,0 +1,188 @@
+# spectrum.py
+
+"""
+Spectrum analyzer and VU meter for the desk display.
+
+SpectrumAnalyzer records the audio monitor source (what is currently playing)
+through an external capture command such as parec or pw-record. It reads raw
+16-bit mono samples in fixed-size batches, one batch per frame, and computes
+log-spaced FFT bands plus peak and RMS levels with NumPy. The result is a
+small binary frame, so the ESP32 only has to draw bars and never does DSP.
+
+Frame layout (schema version 1), all fields u8:
+
+    offset  field
+    0       schema version (SPECTRUM_SCHEMA_VERSION)
+    1       band count N
+    2       peak level
+    3       RMS level
+    4       N band levels, lowest frequency first
+
+Every level is linear in dB: 0 is floor_db (or quieter), 255 is 0 dBFS.
+If the analyzer falls behind, whole frames are skipped rather than delayed.
+If publishing is slower than the frame rate, only the newest frame is sent.
+Runs of silent frames are sent once.
+"""
+
+import asyncio
+import logging
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional; without it the analyzer does not start
+    np = None
+
+SPECTRUM_SCHEMA_VERSION = 1
+FFT_SIZE = 2048 # ~21 Hz resolution at 44.1 kHz; consecutive frames overlap
+MIN_FREQUENCY = 40.0
+MAX_FREQUENCY = 16000.0
+RESTART_DELAY_SECONDS = 5.0 # Wait before restarting a capture command that exited
+# Without the DSP a backlog drains in a few milliseconds. Still "behind" after this many frame
+# periods means the audio clock itself moved (a capture stall, dropped samples, clock drift).
+REANCHOR_FRAMES = 3
+
+_HEADER = struct.Struct('<BBBB')
+
+
+class SpectrumAnalyzer:
+    """Turns the capture command's PCM stream into frames and hands them to publish(frame)."""
+
+    def __init__(self, publish, capture_command, sample_rate=44100, fps=30, bands=16, floor_db=-70.0):
+        self.publish = publish
+        self.capture_command = capture_command
+        self.sample_rate = sample_rate
+        self.fps = fps
+        self.bands = bands
+        self.floor_db = floor_db
+        self.hop = sample_rate // fps # Samples per frame
+
+        # --- Metrics ---
+        self.frames = 0
+        self.skipped = 0 # Not computed because the analyzer was behind
+        self.superseded = 0 # Computed but replaced by a newer frame before it could be sent
+
+        self._latest = None
+        self._frame_ready = asyncio.Event()
+        self._last_sent_silent = False
+        if np is not None:
+            self._setup_dsp()
+
+    def _setup_dsp(self):
+        self._window = np.hanning(FFT_SIZE).astype(np.float32)
+        # Magnitude of a full-scale sine after the Hann window, i.e. 0 dBFS
+        self._reference = FFT_SIZE * self._window.mean() / 2
+        self._samples = np.zeros(FFT_SIZE, dtype=np.float32)
+        edges = np.geomspace(MIN_FREQUENCY, min(MAX_FREQUENCY, self.sample_rate / 2), self.bands + 1)
+        bins = np.round(edges * FFT_SIZE / self.sample_rate).astype(int)
+        # Every band gets at least one FFT bin of its own
+        for i in range(1, len(bins)):
+            bins[i] = max(bins[i], bins[i - 1] + 1)
+        self._band_starts = bins[:-1]
+        self._last_bin = bins[-1]
+
+    async def run(self):
+        if np is None:
+            logging.warning("NumPy is not installed: the spectrum analyzer is disabled.")
+            return
+        await asyncio.gather(self._capture_loop(), self._send_loop())
+
+    async def _capture_loop(self):
+        while True:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self.capture_command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+            except FileNotFoundError:
+                logging.error(f"Spectrum capture command '{self.capture_command[0]}' not found; analyzer stopped.")
+                return
+            logging.info(f"Spectrum analyzer capturing with '{self.capture_command[0]}' "
+                         f"({self.fps} fps, {self.bands} bands).")
+            try:
+                await self._process_stream(process.stdout)
+            except asyncio.IncompleteReadError:
+                logging.warning(f"Spectrum capture ended; restarting in {RESTART_DELAY_SECONDS:.0f}s.")
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            await asyncio.sleep(RESTART_DELAY_SECONDS)
+
+    async def _process_stream(self, stream):
+        batch_bytes = self.hop * 2
+        consumed = 0 # Samples read so far; the audio clock
+        baseline = float('inf') # Smallest offset between wall clock and audio clock, i.e. no backlog
+        behind_since = None # Wall clock time of the first skipped frame in a row
+        while True:
+            data = await stream.readexactly(batch_bytes)
+            now = time.monotonic()
+            consumed += self.hop
+            offset = now - consumed / self.sample_rate
+            baseline = min(baseline, offset)
+            # More than a frame of audio already waiting means the analyzer is behind: skip the DSP
+            if offset - baseline > 1 / self.fps:
+                if behind_since is None:
+                    behind_since = now
+                if now - behind_since <= REANCHOR_FRAMES / self.fps:
+                    self.skipped += 1
+                    continue
+                baseline = offset # Frames keep arriving in real time, so this is the new "no backlog"
+            behind_since = None
+            self._latest = self.compute_frame(np.frombuffer(data, dtype='<i2'))
+            if self._frame_ready.is_set():
+                self.superseded += 1
+            self._frame_ready.set()
+
+    def compute_frame(self, batch):
+        """Computes one frame from a batch of int16 samples."""
+        scaled = batch.astype(np.float32) / 32768.0
+        # Slide the FFT window forward by one batch (at low frame rates a batch can be longer)
+        count = min(len(scaled), FFT_SIZE)
+        self._samples[:FFT_SIZE - count] = self._samples[count:]
+        self._samples[FFT_SIZE - count:] = scaled[-count:]
+
+        peak = float(np.abs(scaled).max())
+        rms = float(np.sqrt(np.mean(np.square(scaled))))
+
+        magnitude = np.abs(np.fft.rfft(self._samples * self._window))[:self._last_bin]
+        # The strongest bin of each band, so a tone reads the same whatever the band width
+        strongest = np.maximum.reduceat(magnitude, self._band_starts)
+        band_db = 20 * np.log10(np.maximum(strongest, 1e-10) / self._reference)
+
+        levels = np.clip((band_db - self.floor_db) / -self.floor_db * 255, 0, 255).astype(np.uint8)
+        header = _HEADER.pack(SPECTRUM_SCHEMA_VERSION, self.bands, self._level(peak), self._level(rms))
+        return header + levels.tobytes()
+
+    def _level(self, amplitude):
+        if amplitude <= 0:
+            return 0
+        db = 20 * np.log10(amplitude)
+        return int(np.clip((db - self.floor_db) / -self.floor_db * 255, 0, 255))
+
+    async def _send_loop(self):
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            frame = self._latest
+            silent = not any(frame[2:])
+            if silent and self._last_sent_silent:
+                continue
+            try:
+                await self.publish(frame)
+            except Exception as e:
+                logging.warning(f"Failed to publish spectrum frame: {e}")
+                continue
+            self._last_sent_silent = silent
+            self.frames += 1
+
+
+def decode_frame(frame):
+    """Returns (peak, rms, bands) of a frame. Raises ValueError on bad input."""
+    if len(frame) < _HEADER.size:
+        raise ValueError("Spectrum frame is shorter than its header")
+    version, band_count, peak, rms = _HEADER.unpack_from(frame)
+    if version != SPECTRUM_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported spectrum schema version {version}")
+    if len(frame) != _HEADER.size + band_count:
+        raise ValueError("Spectrum frame length does not match its band count")
+    return peak, rms, list(frame[_HEADER.size:])
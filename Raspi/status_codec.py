@@ -0,0 +1,99 @@
+# status_codec.py
+
+"""
+Compact binary encoding of the music status for microcontroller consumers.
+
+The ESP32 display can read this with a couple of memcpy()s instead of running
+a JSON parser on every update. All integers are little-endian.
+
+Layout (schema version 1):
+
+    offset  type    field
+    0       u8      schema version (STATUS_SCHEMA_VERSION)
+    1       u8      status: 0 = Stopped, 1 = Playing, 2 = Paused
+    2       u8      flags: bit 0 = length valid, bit 1 = position anchor valid
+    3       u8      reserved (0)
+    4       u32     length in seconds
+    8       u32     elapsed in milliseconds (position anchor)
+    12      u64     elapsed_timestamp in Unix milliseconds (position anchor)
+    20      f32     rate (0 unless playing)
+    24      ...     title, artist, player, album_art_url, each as
+                    u16 byte length followed by that many UTF-8 bytes
+
+A consumer computes the current position exactly like with the JSON status:
+elapsed + (now - elapsed_timestamp) * rate.
+"""
+
+import struct
+
+STATUS_SCHEMA_VERSION = 1
+
+_HEADER = struct.Struct('<BBBxIIQf')
+_STRING_LENGTH = struct.Struct('<H')
+_MAX_STRING_BYTES = 0xFFFF
+
+_STATUS_CODES = {"Stopped": 0, "Playing": 1, "Paused": 2}
+_STATUS_NAMES = {code: name for name, code in _STATUS_CODES.items()}
+_STRING_FIELDS = ("title", "artist", "player", "album_art_url")
+
+FLAG_LENGTH = 0x01
+FLAG_POSITION = 0x02
+
+
+def _encode_string(value):
+    data = (value or "").encode('utf-8')
+    if len(data) > _MAX_STRING_BYTES:
+        # Cut on a character boundary so the result stays valid UTF-8
+        data = data[:_MAX_STRING_BYTES].decode('utf-8', errors='ignore').encode('utf-8')
+    return _STRING_LENGTH.pack(len(data)) + data
+
+
+def encode_status(payload):
+    """Encodes a status dict (as published on music/status) into the binary layout."""
+    flags = 0
+    length = payload.get("length")
+    if length is not None:
+        flags |= FLAG_LENGTH
+    elapsed = payload.get("elapsed")
+    timestamp = payload.get("elapsed_timestamp")
+    if elapsed is not None and timestamp is not None:
+        flags |= FLAG_POSITION
+
+    header = _HEADER.pack(
+        STATUS_SCHEMA_VERSION,
+        _STATUS_CODES.get(payload.get("status"), 0),
+        flags,
+        int(length or 0),
+        int(round((elapsed or 0) * 1000)),
+        int(round((timestamp or 0) * 1000)),
+        float(payload.get("rate") or 0.0),
+    )
+    return header + b''.join(_encode_string(payload.get(field)) for field in _STRING_FIELDS)
+
+
+def decode_status(data):
+    """Decodes the binary layout back into a status dict. Raises ValueError on bad input."""
+    if len(data) < _HEADER.size:
+        raise ValueError("Status frame is shorter than its header")
+    version, status, flags, length, elapsed_ms, timestamp_ms, rate = _HEADER.unpack_from(data)
+    if version != STATUS_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported status schema version {version}")
+
+    payload = {
+        "status": _STATUS_NAMES.get(status, "Stopped"),
+        "length": length if flags & FLAG_LENGTH else None,
+        "elapsed": elapsed_ms / 1000 if flags & FLAG_POSITION else None,
+        "elapsed_timestamp": timestamp_ms / 1000 if flags & FLAG_POSITION else None,
+        "rate": rate,
+    }
+    offset = _HEADER.size
+    for field in _STRING_FIELDS:
+        if offset + _STRING_LENGTH.size > len(data):
+            raise ValueError(f"Status frame truncated before '{field}'")
+        (size,) = _STRING_LENGTH.unpack_from(data, offset)
+        offset += _STRING_LENGTH.size
+        if offset + size > len(data):
+            raise ValueError(f"Status frame truncated inside '{field}'")
+        payload[field] = bytes(data[offset:offset + size]).decode('utf-8')
+        offset += size
+    return payload
@@ -0,0 +1,137 @@
+# telemetry.py
+
+"""
+Host temperature and CPU load for the ESP32 fan controller (fan_control.md).
+
+HostTelemetry opens the thermal zones' temp files under /sys/class/thermal
+and /proc/stat once and then reads them with os.pread at offset 0, which
+makes the kernel render the current value again. A sample is therefore one
+system call per file, without any open(), file object or buffering.
+
+Every sample is handed to publish(payload) as compact JSON:
+
+    {"temp":48.3,"load":12.5}
+
+temp is the hottest thermal zone in °C, since the fan has to keep the
+hottest part cool. load is the share of CPU time that was not idle since the
+previous sample, in percent.
+
+Samples are taken every min_interval while the temperature or the load is
+changing noticeably. While both are stable, the interval doubles up to
+max_interval. The fan controller thus follows a ramp within a fraction of a
+second, and a silence longer than max_interval means the readings are stale.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+
+THERMAL_ROOT = "/sys/class/thermal"
+STAT_PATH = "/proc/stat"
+STAT_READ_BYTES = 256 # Enough for the aggregate "cpu" line, which comes first
+
+
+class HostTelemetry:
+    """Samples the thermal zones and /proc/stat through pre-opened descriptors at an adaptive rate."""
+
+    def __init__(self, publish, min_interval=0.5, max_interval=10.0, temp_step=1.0, load_step=15.0,
+                 thermal_root=THERMAL_ROOT, stat_path=STAT_PATH):
+        self.publish = publish
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.temp_step = temp_step # Changes of at least this many °C between samples count as a ramp
+        self.load_step = load_step # Same for the load, in percentage points
+        self.thermal_root = thermal_root
+        self.stat_path = stat_path
+        self.samples = 0
+        self._zones = {} # zone directory (e.g. "thermal_zone0") -> fd of its temp file
+        self._stat = None # fd of /proc/stat
+        self._cpu_times = None # (busy, total) jiffies of the previous sample
+
+    def open(self):
+        """Opens the files to sample. Returns False if there is nothing to sample on this host."""
+        for zone in sorted(glob.glob(os.path.join(self.thermal_root, "thermal_zone*"))):
+            try:
+                self._zones[os.path.basename(zone)] = os.open(os.path.join(zone, "temp"), os.O_RDONLY)
+            except OSError as e:
+                logging.warning(f"Skipping thermal zone {zone}: {e}")
+        try:
+            self._stat = os.open(self.stat_path, os.O_RDONLY)
+        except OSError as e:
+            logging.warning(f"Cannot read CPU load from {self.stat_path}: {e}")
+        return bool(self._zones) or self._stat is not None
+
+    def close(self):
+        for fd in self._zones.values():
+            os.close(fd)
+        if self._stat is not None:
+            os.close(self._stat)
+        self._zones = {}
+        self._stat = None
+
+    def read_temperature(self):
+        """Returns the temperature of the hottest zone in °C, or None if no zone could be read."""
+        hottest = None
+        for fd in self._zones.values():
+            try:
+                millidegrees = int(os.pread(fd, 16, 0))
+            except (OSError, ValueError):
+                continue # Some zones (e.g. of a powered-down Wi-Fi chip) can't be read at times
+            if hottest is None or millidegrees > hottest:
+                hottest = millidegrees
+        return hottest / 1000 if hottest is not None else None
+
+    def read_load(self):
+        """Returns the CPU load in percent since the previous call, or None on the first call."""
+        if self._stat is None:
+            return None
+        line = os.pread(self._stat, STAT_READ_BYTES, 0).split(b'\n', 1)[0]
+        # cpu user nice system idle iowait irq softirq steal [guest guest_nice, already part of user/nice]
+        times = [int(field) for field in line.split()[1:9]]
+        total = sum(times)
+        busy = total - times[3] - times[4]
+        previous, self._cpu_times = self._cpu_times, (busy, total)
+        if previous is None or total <= previous[1]:
+            return None
+        return 100 * (busy - previous[0]) / (total - previous[1])
+
+    async def run(self):
+        if not self.open():
+            logging.warning("No thermal zones and no CPU statistics found: host telemetry is disabled.")
+            return
+        logging.info(f"Host telemetry sampling {len(self._zones)} thermal zone(s) "
+                     f"every {self.min_interval:g}-{self.max_interval:g}s.")
+        self.read_load() # Baseline for the first load reading
+        interval = self.min_interval
+        last = None # (temp, load) of the previous sample
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                temp, load = self.read_temperature(), self.read_load()
+                if last is None or _moved(last[0], temp, self.temp_step) or _moved(last[1], load, self.load_step):
+                    interval = self.min_interval
+                else:
+                    interval = min(interval * 2, self.max_interval)
+                last = (temp, load)
+
+                payload = {}
+                if temp is not None:
+                    payload["temp"] = round(temp, 1)
+                if load is not None:
+                    payload["load"] = round(load, 1)
+                try:
+                    await self.publish(json.dumps(payload, separators=(',', ':')))
+                except Exception as e:
+                    logging.warning(f"Failed to publish host telemetry: {e}")
+                    continue
+                self.samples += 1
+        finally:
+            self.close()
+
+
+def _moved(before, now, step):
+    if before is None or now is None:
+        return before is not now
+    return abs(now - before) >= step
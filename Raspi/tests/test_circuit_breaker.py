@@ -0,0 +1,87 @@
+# test_circuit_breaker.py
+
+"""
+Unit tests for main.CircuitBreaker, the per-player quarantine of players that
+stop answering their D-Bus calls. Times are passed in explicitly, so nothing
+here sleeps.
+
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, min_seconds=1.0, max_seconds=8.0)
+
+    def quarantine(self, now=0.0):
+        for _ in range(self.breaker.threshold):
+            self.breaker.timed_out(now=now)
+
+    def test_quarantined_after_threshold(self):
+        self.assertFalse(self.breaker.timed_out(now=0.0))
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.timed_out(now=0.0))
+        self.assertTrue(self.breaker.quarantined)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_at, 1.0)
+
+    def test_reply_resets_timeout_count(self):
+        self.breaker.timed_out(now=0.0)
+        self.breaker.succeeded()
+        self.breaker.timed_out(now=0.0)
+        self.assertFalse(self.breaker.quarantined)
+
+    def test_calls_in_flight_do_not_extend_quarantine(self):
+        self.quarantine()
+        self.assertFalse(self.breaker.timed_out(now=0.5))
+        self.assertEqual(self.breaker.retry_at, 1.0)
+
+    def test_probe_only_when_due(self):
+        self.quarantine()
+        self.assertFalse(self.breaker.start_probe(now=0.5))
+        self.assertTrue(self.breaker.start_probe(now=1.0))
+        # One probe per quarantine period
+        self.assertFalse(self.breaker.start_probe(now=1.5))
+
+    def test_probe_timeouts_double_quarantine_up_to_max(self):
+        self.quarantine()
+        now, periods = 0.0, []
+        for _ in range(5):
+            now = self.breaker.retry_at
+            self.assertTrue(self.breaker.start_probe(now=now))
+            self.assertTrue(self.breaker.timed_out(probe=True, now=now))
+            periods.append(self.breaker.retry_at - now)
+        self.assertEqual(periods, [2.0, 4.0, 8.0, 8.0, 8.0])
+
+    def test_probe_reply_lifts_quarantine_but_keeps_backoff(self):
+        self.quarantine()
+        self.breaker.start_probe(now=1.0)
+        self.breaker.timed_out(probe=True, now=1.0) # quarantine_seconds is now 2
+        self.breaker.start_probe(now=3.0)
+        self.assertTrue(self.breaker.succeeded(probe=True))
+        self.assertTrue(self.breaker.allow())
+        # Timing out again picks the backoff up where it was
+        self.quarantine(now=10.0)
+        self.assertEqual(self.breaker.retry_at, 14.0)
+
+    def test_regular_reply_resets_backoff(self):
+        self.quarantine()
+        self.breaker.start_probe(now=1.0)
+        self.breaker.timed_out(probe=True, now=1.0)
+        self.breaker.start_probe(now=3.0)
+        self.breaker.succeeded(probe=True)
+        self.assertFalse(self.breaker.succeeded())
+        self.quarantine(now=10.0)
+        self.assertEqual(self.breaker.retry_at, 11.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
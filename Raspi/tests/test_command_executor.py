@@ -0,0 +1,110 @@
+# test_command_executor.py
+
+"""
+Unit tests for main.CommandExecutor: coalescing of knob values, accumulation
+of deltas, the order of discrete commands and drops when the queue is full.
+The handlers are stand-ins that record their payloads; no player is involved.
+
+    python3 -m unittest discover -s tests
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from main import CommandExecutor, ReplyTo
+
+PLAYER = "org.mpris.MediaPlayer2.test"
+
+
+class CommandExecutorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.ran = [] # (topic, payload) in execution order
+        self.replies = [] # (response topic, result)
+        self.gate = asyncio.Event() # Holds up the "blocking" handler until set
+        self.executor = self.start_executor()
+
+    def start_executor(self):
+        executor = CommandExecutor(None, self.respond)
+        task = asyncio.ensure_future(executor.run())
+        self.addCleanup(task.cancel)
+        return executor
+
+    async def respond(self, reply_to, result):
+        self.replies.append((reply_to.response_topic, result))
+
+    def handler(self, topic):
+        async def handle(proxies, service_name, payload):
+            self.ran.append((topic, payload))
+        return handle
+
+    async def blocking(self, proxies, service_name, payload):
+        await self.gate.wait()
+
+    def submit(self, topic, payload, reply=None, executor=None):
+        (executor or self.executor).submit(topic, self.handler(topic), PLAYER, payload,
+                                           ReplyTo(reply) if reply else None)
+
+    async def run_all(self, executor=None):
+        self.gate.set()
+        await asyncio.wait_for((executor or self.executor).wait_idle(), 1.0)
+        await asyncio.sleep(0) # Let the background replies go out
+
+    async def test_coalesces_values(self):
+        self.executor.submit("music/control/next", self.blocking, PLAYER, b"")
+        await asyncio.sleep(0)
+        for i, volume in enumerate((b"10", b"20", b"30")):
+            self.submit("music/control/volume", volume, reply=f"r{i}")
+        await self.run_all()
+        self.assertEqual(self.ran, [("music/control/volume", b"30")])
+        self.assertEqual(self.executor.coalesced, 2)
+        # Every requester hears about the command its value was merged into
+        self.assertEqual(sorted(topic for topic, _ in self.replies), ["r0", "r1", "r2"])
+        self.assertTrue(all(result["ok"] for _, result in self.replies))
+
+    async def test_accumulates_deltas(self):
+        self.executor.submit("music/control/next", self.blocking, PLAYER, b"")
+        await asyncio.sleep(0)
+        for step in (b"+5", b"5", b"-2"):
+            self.submit("music/control/volume/step", step)
+        await self.run_all()
+        self.assertEqual(self.ran, [("music/control/volume/step", b"8.0")])
+
+    async def test_invalid_value_does_not_poison_waiting_one(self):
+        self.executor.submit("music/control/next", self.blocking, PLAYER, b"")
+        await asyncio.sleep(0)
+        for step in (b"abc", b"5", b"nan", b"inf", b"5"):
+            self.submit("music/control/volume/step", step, reply="r")
+        await self.run_all()
+        self.assertEqual(self.ran, [("music/control/volume/step", b"10.0")])
+        self.assertEqual(self.executor.dropped, 3)
+        self.assertEqual(sum(not result["ok"] for _, result in self.replies), 3)
+
+    async def test_discrete_commands_keep_order(self):
+        for topic in ("music/control/next", "music/control/playpause", "music/control/next"):
+            self.submit(topic, b"")
+        await self.run_all()
+        self.assertEqual([topic for topic, _ in self.ran],
+                         ["music/control/next", "music/control/playpause", "music/control/next"])
+
+    async def test_drops_when_queue_full(self):
+        with mock.patch.object(main, "COMMAND_QUEUE_SIZE", 2):
+            executor = self.start_executor()
+        executor.submit("music/control/next", self.blocking, PLAYER, b"")
+        await asyncio.sleep(0) # Taken off the queue, so two more fit
+        for i in range(4):
+            self.submit("music/control/next", str(i).encode(), reply=f"r{i}", executor=executor)
+        self.assertEqual(executor.dropped, 2)
+        await self.run_all(executor)
+        self.assertEqual(self.ran, [("music/control/next", b"0"), ("music/control/next", b"1")])
+        failed = sorted(topic for topic, result in self.replies if not result["ok"])
+        self.assertEqual(failed, ["r2", "r3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
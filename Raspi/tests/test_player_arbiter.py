@@ -0,0 +1,78 @@
+# test_player_arbiter.py
+
+"""
+Unit tests for main.PlayerArbiter, which picks the active player and holds it
+for a while after a switch. Times are passed in explicitly, so nothing here
+sleeps.
+
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import PlayerArbiter, PlayerSnapshot
+
+
+def snapshot(name, status, title="Song"):
+    return PlayerSnapshot(service_name=f"org.mpris.MediaPlayer2.{name}", status=status, title=title,
+                          artist="", album_art_url="", length=None, elapsed=None)
+
+
+def selected(player):
+    return player.service_name.rsplit('.', 1)[1] if player else None
+
+
+class PlayerArbiterTest(unittest.TestCase):
+    def setUp(self):
+        self.arbiter = PlayerArbiter(hold_seconds=3.0)
+
+    def test_no_players(self):
+        self.assertIsNone(self.arbiter.select([], now=0.0))
+        self.assertIsNone(self.arbiter.active_service_name)
+
+    def test_playing_beats_paused(self):
+        players = [snapshot("a", "Paused"), snapshot("b", "Playing")]
+        self.assertEqual(selected(self.arbiter.select(players, now=0.0)), "b")
+
+    def test_most_recent_activity_wins(self):
+        self.arbiter.select([snapshot("a", "Paused"), snapshot("b", "Paused")], now=0.0)
+        players = [snapshot("a", "Paused", title="Next Song"), snapshot("b", "Paused")]
+        self.assertEqual(selected(self.arbiter.select(players, now=10.0)), "a")
+
+    def test_switch_held_down_then_rechecked(self):
+        self.arbiter.select([snapshot("a", "Playing"), snapshot("b", "Paused")], now=0.0)
+        players = [snapshot("a", "Playing"), snapshot("b", "Playing")]
+        self.assertEqual(selected(self.arbiter.select(players, now=1.0)), "a")
+        self.assertEqual(self.arbiter.recheck_in, 2.0)
+        # Nothing changes in the meantime; the recheck switches once the hold-down is over
+        self.assertEqual(selected(self.arbiter.select(players, now=3.0)), "b")
+        self.assertIsNone(self.arbiter.recheck_in)
+        self.assertEqual(self.arbiter.switched_at, 3.0)
+
+    def test_churn_switches_at_most_once_per_hold(self):
+        self.arbiter.select([snapshot("a", "Playing")], now=0.0)
+        switches, active = 0, "a"
+        for step in range(1, 30):
+            now = step * 0.2
+            players = [snapshot("a", "Playing", title=f"a{step}"), snapshot("b", "Playing", title=f"b{step}")]
+            chosen = selected(self.arbiter.select(players, now=now))
+            switches += chosen != active
+            active = chosen
+        self.assertLessEqual(switches, 2) # 5.8s of churn, 3s hold
+
+    def test_vanished_player_switches_immediately(self):
+        self.arbiter.select([snapshot("a", "Playing"), snapshot("b", "Paused")], now=0.0)
+        self.assertEqual(selected(self.arbiter.select([snapshot("b", "Paused")], now=0.5)), "b")
+        self.assertIsNone(self.arbiter.recheck_in)
+        self.assertEqual(self.arbiter.active_service_name, "org.mpris.MediaPlayer2.b")
+
+    def test_unknown_status_is_ignored(self):
+        self.assertIsNone(self.arbiter.select([snapshot("a", "")], now=0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# test_replay.py
+
+"""
+Regression tests that replay the recordings in recordings/ against the bridge
+with replay.py and compare its publishes with the expected ones.
+
+    python3 -m unittest discover -s tests
+
+After an intended change in what the bridge publishes, regenerate the
+expectation and review its diff:
+
+    python3 replay.py tests/recordings/two_players.jsonl --output tests/recordings/two_players.published.jsonl
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+RASPI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDINGS_DIR = os.path.join(RASPI_DIR, "tests", "recordings")
+REPLAY_TIMEOUT_SECONDS = 60
+
+
+def run_replay(recording, expected, speed=1):
+    return subprocess.run(
+        [sys.executable, "replay.py", os.path.join(RECORDINGS_DIR, recording), "--expect", expected,
+         "--speed", str(speed)],
+        cwd=RASPI_DIR, capture_output=True, text=True, timeout=REPLAY_TIMEOUT_SECONDS)
+
+
+@unittest.skipUnless(shutil.which("dbus-daemon"), "replay.py needs dbus-daemon")
+class ReplayTest(unittest.TestCase):
+    def test_two_players(self):
+        result = run_replay("two_players.jsonl", os.path.join(RECORDINGS_DIR, "two_players.published.jsonl"))
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    def test_two_players_accelerated(self):
+        # Without pauses, commands must still reach the players they reached in the recording
+        expected = os.path.join(RECORDINGS_DIR, "two_players.published.jsonl")
+        for speed in (10, 0):
+            with self.subTest(speed=speed):
+                result = run_replay("two_players.jsonl", expected, speed=speed)
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+    def test_divergence_fails(self):
+        with open(os.path.join(RECORDINGS_DIR, "two_players.published.jsonl"), encoding='utf-8') as f:
+            messages = [json.loads(line) for line in f]
+        for message in messages:
+            message["payload"] = message["payload"].replace("Second Song", "Another Song")
+        with tempfile.NamedTemporaryFile('w', suffix=".jsonl", delete=False, encoding='utf-8') as f:
+            f.writelines(json.dumps(message) + "\n" for message in messages)
+        try:
+            result = run_replay("two_players.jsonl", f.name)
+        finally:
+            os.unlink(f.name)
+        self.assertEqual(result.returncode, 1, result.stdout + result.stderr)
+        self.assertIn("music/status: ", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()